@@ -0,0 +1,114 @@
+"""Measure event loop latency while comps are decoded from coroutines.
+
+Run from the repository root with `python -m src.benchmarks.bench_async`,
+optionally followed by the number of comps and the copies of the example
+tools in each. The comps are made from the example composition with its
+tools copied over and over, and are all loaded at once with `aiterdir`,
+blocking the loop (`decode` called directly), in threads and in processes.
+A heartbeat coroutine wakes up every millisecond and records how late it is.
+"""
+
+import sys
+import time
+import asyncio
+import shutil
+import tempfile
+import statistics
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from src.main.flpp import FLPP, NamedTable
+    from src.main.aio import Offload, DEFAULT_LIMIT
+except ModuleNotFoundError:
+    from main.flpp import FLPP, NamedTable
+    from main.aio import Offload, DEFAULT_LIMIT
+
+COMP = Path(__file__).parent.parent / "tests" / "examples" / "fusion_composition.comp"
+INTERVAL = 0.001
+MODES = ("blocking", "threads", "processes")
+
+
+def write_comps(directory: Path, count: int, copies: int):
+    """Write `count` comps with `copies` renamed copies of each example tool."""
+    parser = FLPP(nodes=True)
+    data = parser.decode(COMP.read_text(encoding="utf-8"))
+    tools = data["Tools"]
+    if isinstance(tools, NamedTable):
+        tools = tools.fields
+    data["Tools"] = {
+        f"{name}_{i}": tool for i in range(copies) for name, tool in tools.items()
+    }
+    text = parser.encode(data, header="Composition")
+    for i in range(count):
+        (directory / f"comp_{i:03}.comp").write_text(text, encoding="utf-8")
+    return len(text)
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(INTERVAL)
+        lags.append(time.perf_counter() - start - INTERVAL)
+
+
+async def load_all(parser: FLPP, directory: Path, mode: str, limit: int) -> int:
+    if mode == "blocking":
+        count = 0
+        for path in sorted(directory.glob("*.comp")):
+            parser.decode(path.read_text(encoding="utf-8"))
+            count += 1
+            # let the heartbeat run between files, as a naive service would
+            await asyncio.sleep(0)
+        return count
+    pool = ThreadPoolExecutor if mode == "threads" else ProcessPoolExecutor
+    with pool(limit) as executor:
+        offload = Offload(executor, limit=limit)
+        return len([item async for item in parser.aiterdir(directory, offload=offload)])
+
+
+async def measure(parser: FLPP, directory: Path, mode: str, limit: int) -> dict:
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    count = await load_all(parser, directory, mode, limit)
+    seconds = time.perf_counter() - start
+    stop.set()
+    await beat
+    lags.sort()
+    return {
+        "files": count,
+        "seconds": seconds,
+        "max_lag": lags[-1],
+        "p99_lag": lags[int(len(lags) * 0.99)],
+        "median_lag": statistics.median(lags),
+    }
+
+
+def run(count=32, copies=40, limit=DEFAULT_LIMIT, modes=MODES, report=None) -> dict:
+    """Latency statistics, in seconds, of every mode in `modes`."""
+    directory = Path(tempfile.mkdtemp())
+    parser = FLPP()
+    results = {}
+    try:
+        size = write_comps(directory, count, copies)
+        for mode in modes:
+            result = results[mode] = asyncio.run(
+                measure(parser, directory, mode, limit)
+            )
+            if report:
+                report(
+                    f"{mode:>10}: {count} x {size / 1e6:.1f} MB in "
+                    f"{result['seconds']:6.2f} s, loop lag max "
+                    f"{result['max_lag'] * 1000:8.1f} ms, p99 "
+                    f"{result['p99_lag'] * 1000:7.1f} ms, median "
+                    f"{result['median_lag'] * 1000:6.2f} ms"
+                )
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+if __name__ == "__main__":
+    run(*map(int, sys.argv[1:3]), report=print)
@@ -0,0 +1,61 @@
+"""Compare the FLPP binary format with indented JSON and pickle.
+
+Run from the repository root with `python -m src.benchmarks.bench_binary`.
+Sizes and load times are measured on the example files and on a synthetic
+composition, next to the size of the Lua source and the time to decode it.
+"""
+
+import io
+import sys
+import json
+import pickle
+import timeit
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp
+except ModuleNotFoundError:
+    from main.flpp import flpp
+
+from .generate import generate_comp
+
+EXAMPLES = Path(__file__).parent.parent / "tests" / "examples"
+
+
+def formats(data) -> dict:
+    """`(serialized, load)` of each format for the decoded `data`."""
+    binary = io.BytesIO()
+    flpp.dump_binary(data, binary)
+    return {
+        "binary": (binary.getvalue(), lambda b: flpp.load_binary(io.BytesIO(b))),
+        "json": (json.dumps(data, indent=4).encode(), json.loads),
+        "pickle": (pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+    }
+
+
+def compare(name: str, text: str, number=5, repeat=3) -> list:
+    best = lambda func: min(timeit.repeat(func, repeat=repeat, number=number)) / number
+    lines = [
+        f"{name}: Lua {len(text) / 1e3:9.1f} kB, "
+        f"decode {best(lambda: flpp.decode(text)) * 1000:8.2f} ms"
+    ]
+    for fmt, (data, load) in formats(flpp.decode(text)).items():
+        lines.append(
+            f"{fmt:>10}: {len(data) / 1e3:9.1f} kB, "
+            f"load {best(lambda: load(data)) * 1000:8.2f} ms"
+        )
+    return lines
+
+
+def main(size=1_000_000):
+    texts = {
+        file.name: file.read_text(encoding="utf-8")
+        for file in sorted(EXAMPLES.glob("fusion_*.*"))
+    }
+    texts["synthetic comp"] = generate_comp(size)
+    for name, text in texts.items():
+        print("\n".join(compare(name, text)))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,78 @@
+"""Measure the memory of decoded trees with and without string interning.
+
+Run from the repository root with `python -m src.benchmarks.bench_intern`,
+optionally followed by comp sizes in characters. Every case runs in a fresh
+process, so peak RSS is not inflated by the previous ones; it is reported
+where the `resource` module exists, that is not on Windows. `tracemalloc`
+gives the size of the decoded tree and the peak allocated while decoding.
+"""
+
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    from src.main.flpp import FLPP, INTERN_MODES
+except ModuleNotFoundError:
+    from main.flpp import FLPP, INTERN_MODES
+
+from .generate import generate_comp
+
+SIZES = (1_000_000, 10_000_000)
+
+
+def max_rss() -> int:
+    """Peak resident set size of this process in bytes, or 0 if unknown."""
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def measure(size: int, intern) -> dict:
+    text = generate_comp(size)
+    parser = FLPP(intern=intern)
+    parser.intern_table
+    before = max_rss()
+    start = time.perf_counter()
+    data = parser.decode(text)
+    seconds = time.perf_counter() - start
+    rss = max_rss()
+    del data
+    tracemalloc.start()
+    data = parser.decode(text)
+    tree, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": seconds,
+        "rss": rss,
+        "rss_growth": rss - before,
+        "tree": tree,
+        "peak": peak,
+    }
+
+
+def main(sizes=SIZES):
+    for size in sizes:
+        for intern in INTERN_MODES:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(measure, size, intern).result()
+            print(
+                f"{size / 1e6:5.1f} MB intern={str(intern):>6}: "
+                f"decode {result['seconds']:7.2f} s, "
+                f"tree {result['tree'] / 1e6:8.1f} MB "
+                f"(peak {result['peak'] / 1e6:.1f} MB), "
+                f"peak RSS {result['rss'] / 1e6:8.1f} MB "
+                f"(+{result['rss_growth'] / 1e6:.1f} MB)"
+            )
+
+
+if __name__ == "__main__":
+    main(list(map(int, sys.argv[1:])) or SIZES)
@@ -0,0 +1,44 @@
+"""Compare the time to the first tool of a lazy `decode` with a full one.
+
+Run from the repository root with `python -m src.benchmarks.bench_lazy`.
+The synthetic composition is decoded with `nodes=True`, fully, then lazily
+up to the root table, the first tool and every tool.
+"""
+
+import sys
+import timeit
+
+try:
+    from src.main.flpp import FLPP
+    from src.main.lazy import resolve
+except ModuleNotFoundError:
+    from main.flpp import FLPP
+    from main.lazy import resolve
+
+from .generate import generate_comp
+
+flpp = FLPP(nodes=True)
+
+
+def first_tool(text: str):
+    tools = flpp.decode(text, lazy=True)["Tools"].fields
+    return tools[next(iter(tools))]
+
+
+def main(size=5_000_000, repeat=3):
+    text = generate_comp(size)
+    cases = {
+        "full": lambda: flpp.decode(text),
+        "lazy root": lambda: flpp.decode(text, lazy=True),
+        "first tool": lambda: first_tool(text),
+        "all tools": lambda: resolve(flpp.decode(text, lazy=True)["Tools"]),
+    }
+    baseline = None
+    for name, func in cases.items():
+        best = min(timeit.repeat(func, repeat=repeat, number=1))
+        baseline = baseline or best
+        print(f"{name:>12}: {best * 1000:9.1f} ms  ({baseline / best:5.2f}x)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,46 @@
+"""Time decode with the char engine and encode, on the example files and on
+deeply nested tables.
+
+Run from the repository root with `python -m src.benchmarks.bench_nesting`.
+Both used to recurse once per table; run this on an older checkout to
+compare. Nested tables are written without indentation, which would grow
+with the square of the depth.
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+try:
+    from src.main.flpp import FLPP
+except ModuleNotFoundError:
+    from main.flpp import FLPP
+
+EXAMPLES = Path(__file__).parent.parent / "tests" / "examples"
+
+
+def nested(depth: int) -> str:
+    return "{ a = " * depth + "{ 1, 2 }" + ", b = 1 }" * depth
+
+
+def main(depth=300, number=5, repeat=3):
+    char, regex = FLPP(engine="char"), FLPP()
+    flat = FLPP()
+    flat.tab = ""
+    texts = {
+        file.name: file.read_text(encoding="utf-8")
+        for file in sorted(EXAMPLES.glob("fusion_*.*"))
+    }
+    texts[f"{depth} levels"] = nested(depth)
+    best = lambda func: min(timeit.repeat(func, repeat=repeat, number=number)) / number
+    for name, text in texts.items():
+        data = regex.decode(text)
+        encoder = flat if name.endswith("levels") else regex
+        print(
+            f"{name:>32}: char decode {best(lambda: char.decode(text)) * 1000:8.2f} ms, "
+            f"encode {best(lambda: encoder.encode(data)) * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
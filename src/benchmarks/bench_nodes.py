@@ -0,0 +1,52 @@
+"""Compare the default decoded representation with `FLPP(nodes=True)`.
+
+Run from the repository root with `python -m src.benchmarks.bench_nodes`.
+Decode and encode times are measured on a synthetic composition, along with
+the peak memory of a decode and the size of the resulting tree.
+"""
+
+import sys
+import timeit
+import tracemalloc
+
+try:
+    from src.main.flpp import FLPP
+except ModuleNotFoundError:
+    from main.flpp import FLPP
+
+from .generate import generate_comp
+
+
+def decode_memory(parser: FLPP, text: str):
+    """Peak memory of a decode and memory still held by its result, in bytes."""
+    tracemalloc.start()
+    try:
+        data = parser.decode(text)
+        current, peak = tracemalloc.get_traced_memory()
+        return peak, current
+    finally:
+        del data
+        tracemalloc.stop()
+
+
+def main(size=1_000_000, number=3, repeat=3):
+    text = generate_comp(size)
+    print(f"comp of {len(text) / 1e6:.2f} MB")
+    for name, parser in (("dicts", FLPP()), ("nodes", FLPP(nodes=True))):
+        data = parser.decode(text)
+        decode = min(
+            timeit.repeat(lambda: parser.decode(text), repeat=repeat, number=number)
+        )
+        encode = min(
+            timeit.repeat(lambda: parser.encode(data), repeat=repeat, number=number)
+        )
+        peak, kept = decode_memory(parser, text)
+        print(
+            f"{name:>6}: decode {decode / number * 1000:8.1f} ms, "
+            f"encode {encode / number * 1000:8.1f} ms, "
+            f"peak {peak / 1e6:7.1f} MB, tree {kept / 1e6:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,34 @@
+"""Compare a full `decode` with a selective one on the example composition.
+
+Run from the repository root with `python -m src.benchmarks.bench_select`.
+"""
+import timeit
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp
+except ModuleNotFoundError:
+    from main.flpp import flpp
+
+COMP = Path(__file__).parent.parent / "tests" / "examples" / "fusion_composition.comp"
+SELECTIONS = {
+    "full": None,
+    "filenames": ["Tools.*.Clips.*.Filename"],
+    "current time": ["CurrentTime"],
+    "tools": ["Tools"],
+}
+
+
+def main(number=20, repeat=5):
+    with open(COMP, "r", encoding="utf-8") as f:
+        text = f.read().replace("Composition {", "{", 1)
+    baseline = None
+    for name, select in SELECTIONS.items():
+        timer = timeit.Timer(lambda: flpp.decode(text, select=select))
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        baseline = baseline or best
+        print(f"{name:>14}: {best * 1000:8.3f} ms  ({baseline / best:5.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
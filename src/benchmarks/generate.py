@@ -0,0 +1,256 @@
+"""Synthetic Fusion compositions for benchmarks.
+
+The output follows the layout Fusion writes: an `ordered()` tool list, tools
+as named tables, bracketed input keys, `Clip` tables in loaders, animation
+splines with key frames, polyline masks, nested groups and comments.
+"""
+
+import random
+
+TOOL_TYPES = (
+    "Merge",
+    "Transform",
+    "Blur",
+    "BrightnessContrast",
+    "ColorCorrector",
+    "Background",
+    "ChannelBoolean",
+    "Dissolve",
+    "Letterbox",
+    "TextPlus",
+)
+FORMATS = ("OpenEXRFormat", "PNGFormat", "DPXFormat", "TiffFormat")
+BRACKETED_INPUTS = (
+    "Gamut.SLogVersion",
+    "Clip1.OpenEXRFormat.RedName",
+    "Clip1.PNGFormat.PostMultiply",
+    "TransformMatrix.Size",
+)
+
+
+class CompGenerator:
+    def __init__(
+        self,
+        tools=100,
+        depth=2,
+        string_ratio=0.3,
+        keyframes=24,
+        points=16,
+        seed=0,
+    ):
+        self.tools = tools
+        self.depth = depth
+        self.string_ratio = string_ratio
+        self.keyframes = keyframes
+        self.points = points
+        self.random = random.Random(seed)
+        self.counter = 0
+
+    def name(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def number(self):
+        if self.random.random() < 0.5:
+            return str(self.random.randint(0, 4096))
+        return repr(round(self.random.uniform(-10, 10), self.random.randint(1, 15)))
+
+    def value(self):
+        if self.random.random() < self.string_ratio:
+            return f'"{self.name("value_")}"'
+        return self.number()
+
+    def pos(self):
+        return f"{{ {self.number()}, {self.number()} }}"
+
+    def loader(self, lines: list, indent: str, name: str):
+        fmt = self.random.choice(FORMATS)
+        lines += [
+            f"{indent}{name} = Loader {{",
+            f"{indent}\tClips = {{",
+            f"{indent}\t\tClip {{",
+            f'{indent}\t\t\tID = "Clip1",',
+            f'{indent}\t\t\tFilename = "/shows/show/{name}/plate.0001.exr",',
+            f'{indent}\t\t\tFormatID = "{fmt}",',
+            f"{indent}\t\t\tStartFrame = 1001,",
+            f"{indent}\t\t\tLengthSetManually = true,",
+            f"{indent}\t\t\tGlobalStart = 1001,",
+            f"{indent}\t\t\tGlobalEnd = 1100",
+            f"{indent}\t\t}}",
+            f"{indent}\t}},",
+            f"{indent}\tInputs = {{",
+        ]
+        for key in self.random.sample(BRACKETED_INPUTS, 2):
+            lines.append(
+                f'{indent}\t\t["{key}"] = Input {{ Value = {self.value()}, }},'
+            )
+        lines.append(f'{indent}\t\tGamut = Input {{ Value = FuID {{ "SLog2" }}, }},')
+        lines += [
+            f"{indent}\t}},",
+            f"{indent}\tViewInfo = OperatorInfo {{ Pos = {self.pos()} }},",
+            f"{indent}}},",
+        ]
+
+    def spline(self, lines: list, indent: str, name: str):
+        lines += [
+            f"{indent}{name} = BezierSpline {{",
+            f"{indent}\tSplineColor = {{ Red = 205, Green = 205, Blue = 16 }},",
+            f"{indent}\tNameSet = true,",
+            f"{indent}\tKeyFrames = {{",
+        ]
+        for i in range(self.keyframes):
+            frame = 1001 + i * 4
+            lines.append(
+                f"{indent}\t\t[{frame}] = {{ {self.number()}, "
+                f"LH = {{ {frame - 1.333}, {self.number()} }}, "
+                f"RH = {{ {frame + 1.333}, {self.number()} }}, "
+                "Flags = { Linear = true } },"
+            )
+        lines += [f"{indent}\t}}", f"{indent}}},"]
+
+    def mask(self, lines: list, indent: str, name: str):
+        lines += [
+            f"{indent}{name} = PolylineMask {{",
+            f"{indent}\tInputs = {{",
+            f"{indent}\t\tPolyline = Input {{",
+            f"{indent}\t\t\tValue = Polyline {{",
+            f"{indent}\t\t\t\tClosed = true,",
+            f"{indent}\t\t\t\tPoints = {{",
+        ]
+        for _ in range(self.points):
+            x, y = self.number(), self.number()
+            lines.append(
+                f"{indent}\t\t\t\t\t{{ X = {x}, Y = {y}, LX = 0, LY = 0, RX = 0, RY = 0 }},"
+            )
+        lines += [
+            f"{indent}\t\t\t\t}}",
+            f"{indent}\t\t\t}},",
+            f"{indent}\t\t}},",
+            f"{indent}\t}},",
+            f"{indent}\tViewInfo = OperatorInfo {{ Pos = {self.pos()} }},",
+            f"{indent}}},",
+        ]
+
+    def tool(self, lines: list, indent: str, previous: str):
+        tool_type = self.random.choice(TOOL_TYPES)
+        name = self.name(tool_type)
+        spline = self.name(f"{name}Blend")
+        lines += [
+            f"{indent}{name} = {tool_type} {{",
+            f"{indent}\tCtrlWZoom = false,",
+            f"{indent}\tInputs = {{",
+            f'{indent}\t\tInput = Input {{ SourceOp = "{previous}", Source = "Output", }},',
+            f'{indent}\t\tBlend = Input {{ SourceOp = "{spline}", Source = "Value", }},',
+        ]
+        for i in range(self.random.randint(2, 8)):
+            lines.append(f"{indent}\t\tParam{i} = Input {{ Value = {self.value()}, }},")
+        lines += [
+            f"{indent}\t}},",
+            f"{indent}\tViewInfo = OperatorInfo {{ Pos = {self.pos()} }},",
+            f"{indent}}},",
+        ]
+        self.spline(lines, indent, spline)
+        return name
+
+    def group(self, lines: list, indent: str, depth: int, count: int):
+        name = self.name("Group")
+        lines += [
+            f"{indent}{name} = GroupOperator {{",
+            f"{indent}\tCtrlWZoom = false,",
+            f"{indent}\tInputs = ordered() {{",
+            f'{indent}\t\tInput1 = InstanceInput {{ SourceOp = "{name}In", Source = "Input", }},',
+            f"{indent}\t}},",
+            f"{indent}\tViewInfo = GroupInfo {{ Pos = {self.pos()} }},",
+            f"{indent}\tTools = ordered() {{",
+        ]
+        self.tool_list(lines, indent + "\t\t", depth - 1, count)
+        lines += [f"{indent}\t}},", f"{indent}}},"]
+
+    def tool_list(self, lines: list, indent: str, depth: int, count: int):
+        previous = self.name("Loader")
+        self.loader(lines, indent, previous)
+        count -= 1
+        while count > 0:
+            lines.append(f"{indent}-- {previous} branch")
+            roll = self.random.random()
+            if depth > 0 and count > 4 and roll < 0.1:
+                size = self.random.randint(2, min(count, 20))
+                self.group(lines, indent, depth, size)
+                count -= size
+            elif roll < 0.2:
+                self.mask(lines, indent, self.name("Mask"))
+                count -= 1
+            else:
+                previous = self.tool(lines, indent, previous)
+                count -= 1
+
+    def comp(self, header=False) -> str:
+        lines = [
+            "Composition {" if header else "{",
+            "\tCurrentTime = 1001,",
+            "\tRenderRange = { 1001, 1100 },",
+            "\tGlobalRange = { 1001, 1100 },",
+            "\tHiQ = true,",
+            '\tVersion = "Fusion Studio 18.1.3 build 7",',
+            "\tTools = ordered() {",
+        ]
+        self.tool_list(lines, "\t\t", self.depth, self.tools)
+        lines += [
+            "\t},",
+            "\tFrameSaver = { Loop = 0 },",
+            "\tPrefs = {",
+            "\t\tComp = {",
+            "\t\t\tFrameFormat = {",
+            '\t\t\t\tName = "HD 1080",',
+            "\t\t\t\tWidth = 1920,",
+            "\t\t\t\tHeight = 1080,",
+            "\t\t\t},",
+            "\t\t},",
+            "\t},",
+            "}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def generate_comp(size=None, header=False, **options) -> str:
+    """Generate a composition, with at least `size` characters if given.
+
+    Options are passed to `CompGenerator`: tools, depth, string_ratio,
+    keyframes, points and seed.
+    """
+    generator = CompGenerator(**options)
+    if size is None:
+        return generator.comp(header)
+    # estimate the tool count from a small sample, then grow until big enough
+    sample = CompGenerator(**dict(options, tools=50)).comp()
+    generator.tools = max(1, int(size / len(sample) * 50))
+    text = generator.comp(header)
+    while len(text) < size:
+        generator.tools = int(generator.tools * 1.2) + 1
+        generator.random.seed(options.get("seed", 0))
+        generator.counter = 0
+        text = generator.comp(header)
+    return text
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print a synthetic Fusion comp")
+    parser.add_argument("--size", type=int, help="minimum size in characters")
+    parser.add_argument("--tools", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--string-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(
+        generate_comp(
+            args.size,
+            header=True,
+            tools=args.tools,
+            depth=args.depth,
+            string_ratio=args.string_ratio,
+            seed=args.seed,
+        ),
+        end="",
+    )
@@ -0,0 +1,175 @@
+"""Decode, encode and round-trip benchmarks on synthetic compositions.
+
+Run from the repository root with `python -m src.benchmarks`. Results are
+written as JSON, pass a previous result file with `--compare` to see changes
+between versions.
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime, timezone
+
+try:
+    from src.main.flpp import FLPP
+except ModuleNotFoundError:
+    from main.flpp import FLPP
+
+from .generate import generate_comp
+
+SIZES = (100_000, 1_000_000)
+
+
+def measure(func, runs=5, warmups=1, loops=1) -> dict:
+    """Time `func` like pyperf does: warmups first, then `runs` samples of
+    `loops` calls each. Returns the statistics of seconds per call."""
+    for _ in range(warmups):
+        func()
+    values = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        values.append((time.perf_counter() - start) / loops)
+    return {
+        "values": values,
+        "mean": statistics.mean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def peak_memory(func) -> int:
+    """Peak of memory allocated by one call of `func`, in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def cases(parser: FLPP, text: str) -> dict:
+    data = parser.decode(text)
+    return {
+        "decode": lambda: parser.decode(text),
+        "encode": lambda: parser.encode(data),
+        "round_trip": lambda: parser.encode(parser.decode(text)),
+    }
+
+
+def run(
+    sizes=SIZES,
+    runs=5,
+    warmups=1,
+    engine="regex",
+    arrays=None,
+    memory=True,
+    report=None,
+    **options,
+):
+    """Benchmark every case on a comp of each size, `options` are passed to
+    `generate_comp`. `report` is called with a summary line per benchmark."""
+    parser = FLPP(engine=engine, arrays=arrays)
+    results = {
+        "metadata": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": engine,
+            "arrays": arrays,
+            "options": options,
+        },
+        "benchmarks": {},
+    }
+    for size in sizes:
+        text = generate_comp(size, **options)
+        for name, func in cases(parser, text).items():
+            key = f"{name}_{size}"
+            result = measure(func, runs=runs, warmups=warmups)
+            result["size"] = len(text)
+            result["chars_per_second"] = len(text) / result["mean"]
+            if memory:
+                result["peak_memory"] = peak_memory(func)
+            results["benchmarks"][key] = result
+            if report:
+                report(format_result(key, result))
+    return results
+
+
+def format_result(name: str, result: dict) -> str:
+    line = (
+        f"{name:>22}: {result['mean'] * 1000:10.2f} ms "
+        f"+- {result['stdev'] * 1000:7.2f} ms  "
+        f"{result['chars_per_second'] / 1e6:6.2f} MB/s"
+    )
+    if "peak_memory" in result:
+        line += f"  peak {result['peak_memory'] / 1e6:8.1f} MB"
+    return line
+
+
+def compare(results: dict, reference: dict) -> list:
+    """Lines describing the change of each benchmark against `reference`."""
+    lines = []
+    for name, result in results["benchmarks"].items():
+        old = reference["benchmarks"].get(name)
+        if old is None:
+            continue
+        line = f"{name:>22}: {old['mean'] / result['mean']:5.2f}x faster"
+        if "peak_memory" in result and "peak_memory" in old:
+            line += f", {result['peak_memory'] / old['peak_memory']:5.2f}x memory"
+        lines.append(line)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmups", type=int, default=1)
+    parser.add_argument("--engine", default="regex")
+    parser.add_argument(
+        "--arrays", choices=("array", "numpy"), help="decode numeric tables to arrays"
+    )
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--string-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip tracemalloc runs"
+    )
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.sizes,
+        runs=args.runs,
+        warmups=args.warmups,
+        engine=args.engine,
+        arrays=args.arrays,
+        memory=not args.no_memory,
+        report=print,
+        depth=args.depth,
+        string_ratio=args.string_ratio,
+        seed=args.seed,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        print(f"\ncompared to {args.compare}:")
+        print("\n".join(compare(results, reference)))
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,173 @@
+import os
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .flpp import FILE_HEADERS, READ_CHUNK_SIZE
+
+# files parsed at once by default, threads or processes
+DEFAULT_LIMIT = os.cpu_count() or 4
+
+
+class Cancelled(Exception):
+    """Raised in a worker thread by a job cancelled from the event loop."""
+
+
+class CheckedFile:
+    """Text file object raising `Cancelled` at the next chunk read or written
+    once the `cancelled` event is set."""
+
+    def __init__(self, fp, cancelled: threading.Event):
+        self.fp = fp
+        self.cancelled = cancelled
+
+    def read(self, size=-1):
+        if self.cancelled.is_set():
+            raise Cancelled()
+        return self.fp.read(size)
+
+    def write(self, text: str):
+        if self.cancelled.is_set():
+            raise Cancelled()
+        return self.fp.write(text)
+
+
+def load_file(parser, path, chunk_size, cancelled=None):
+    """Decode the file at `path` `chunk_size` characters at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f if cancelled is None else CheckedFile(f, cancelled)
+        return parser.decode_stream(source, chunk_size)
+
+
+def save_file(parser, obj, path, header, chunk_size, cancelled=None):
+    """Encode `obj` into a file next to `path` and move it in place once
+    complete, so readers never see a partial file."""
+    temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp, "w", encoding="utf-8") as f:
+            target = f if cancelled is None else CheckedFile(f, cancelled)
+            parser.dump(obj, target, header, chunk_size)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+
+class Offload:
+    """Runs the blocking file jobs of `FLPP.aload`, `asave` and `aiterdir` in
+    `executor`, at most `limit` at a time.
+
+    `executor` is a `ThreadPoolExecutor`, a `ProcessPoolExecutor`, or None
+    for the default executor of the running loop. Threads share the GIL with
+    the loop, which is then slowed down while they parse; processes leave it
+    free but send the parser, trees and saved objects through pickle. Jobs
+    over the limit wait in the loop before being submitted.
+
+    A cancelled job is dropped if it has not started. One running in a
+    thread stops at its next chunk, without leaving a partial file behind;
+    one running in a process finishes and its result is dropped. Either way
+    it holds its slot until it has stopped.
+    """
+
+    def __init__(self, executor=None, limit=DEFAULT_LIMIT, chunk_size=READ_CHUNK_SIZE):
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        self.executor = executor
+        self.limit = limit
+        self.chunk_size = chunk_size
+        # semaphores belong to a loop, one is made for each loop using this
+        self._slots = weakref.WeakKeyDictionary()
+
+    def slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.limit)
+        return slots
+
+    async def run(self, func, *args):
+        """Call `func(*args, cancelled)` in the executor and return its result.
+
+        `cancelled` is a `threading.Event` set when the caller is cancelled,
+        None in processes.
+        """
+        loop = asyncio.get_running_loop()
+        threads = not isinstance(self.executor, ProcessPoolExecutor)
+        cancelled = threading.Event() if threads else None
+        async with self.slots():
+            if threads:
+                future = loop.run_in_executor(self.executor, func, *args, cancelled)
+            else:
+                job = self.executor.submit(func, *args, cancelled)
+                future = asyncio.wrap_future(job)
+            try:
+                # shielded, the future is only done once the job has stopped
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if threads:
+                    cancelled.set()
+                else:
+                    job.cancel()
+                # keep the slot until then, so no more than `limit` jobs run
+                while not future.done():
+                    try:
+                        await asyncio.wait([future])
+                    except asyncio.CancelledError:
+                        pass
+                raise
+
+    async def load(self, parser, path):
+        return await self.run(load_file, parser, str(path), self.chunk_size)
+
+    async def save(self, parser, obj, path, header=None):
+        if header is None:
+            header = FILE_HEADERS.get(Path(path).suffix)
+        await self.run(save_file, parser, obj, str(path), header, self.chunk_size)
+
+    async def iterdir(
+        self, parser, directory, pattern="*.comp", return_exceptions=False
+    ):
+        """Yield `(path, data)` of the files matching `pattern` in `directory`
+        as they are decoded.
+
+        No more than `limit` files are read ahead of the consumer. An error
+        cancels the remaining files and is raised, unless `return_exceptions`
+        is set, in which case it is yielded in place of the data.
+        """
+        loop = asyncio.get_running_loop()
+        paths = await loop.run_in_executor(
+            None, lambda: sorted(Path(directory).glob(pattern))
+        )
+        paths = iter(paths)
+        pending = {}
+        try:
+            while True:
+                for path in paths:
+                    pending[loop.create_task(self.load(parser, path))] = path
+                    if len(pending) >= self.limit:
+                        break
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    path = pending.pop(task)
+                    try:
+                        data = task.result()
+                    except Exception as e:
+                        if not return_exceptions:
+                            raise
+                        data = e
+                    yield path, data
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+DEFAULT_OFFLOAD = Offload()
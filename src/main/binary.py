@@ -0,0 +1,357 @@
+import sys
+import math
+import struct
+from array import array
+from itertools import accumulate, islice, repeat, starmap
+from numbers import Integral, Number
+
+from .flpp import NamedTable, ParseError, numpy
+
+MAGIC = b"FLPB"
+# bump when the layout changes, files of other versions are refused
+BINARY_VERSION = 2
+# kinds of tables, then of the values stored whole in the blob
+DICT, LIST, NAMED, ARRAY, NDARRAY, BYTES = range(6)
+# typecodes of the index arrays, then the sizes of the sections
+SECTIONS = struct.Struct("<3s13I")
+DOUBLE = struct.Struct("<d")
+MIN_INT64, MAX_INT64 = -(1 << 63), (1 << 63) - 1
+# the scalar pool starts with these, then come strings, 64 bit ints,
+# doubles and larger ints
+CONSTANTS = (None, True, False)
+STRINGS, INTS, FLOATS, BIGINTS = range(4)
+# strings are split on it unless one of them holds it
+SEPARATOR = "\0"
+LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def little_endian(values: array) -> bytes:
+    if not LITTLE_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def doubles(values) -> bytes:
+    """Little-endian bytes of an `array("d")`."""
+    return little_endian(array("d", values))
+
+
+def indexes(values) -> array:
+    """`values` in the smallest unsigned array holding them."""
+    return array("H" if max(values, default=0) <= 0xFFFF else "I", values)
+
+
+def pool_section(value) -> int:
+    kind = type(value)
+    if kind is str:
+        return STRINGS
+    if kind is float:
+        return FLOATS
+    return INTS if MIN_INT64 <= value <= MAX_INT64 else BIGINTS
+
+
+class BinaryWriter:
+    """Serializes decoded trees into the FLPP binary format.
+
+    Every distinct scalar, a string, number, bool or nil, is written once in
+    a pool, and the keys of dicts once for all the dicts with the same keys,
+    as a shape. Tables are written by height, leaves first, and at each
+    height by kind, as their shapes or lengths and the indexes of their
+    values among the scalars and the tables before them. `BinaryReader`
+    builds each group at once with `map`, `zip` and `dict` rather than
+    reading values one at a time.
+    """
+
+    def __init__(self):
+        # pool index of each scalar, keyed by type as 1 == 1.0 == True
+        self.pool = {(value,): i for i, value in enumerate(CONSTANTS)}
+        self.scalars = list(CONSTANTS)
+        self.shapes = {}
+        # (height, kind, shape or length, refs of the values) of each table,
+        # and (0, kind, sizes, None) of each value stored in the blob
+        self.nodes = []
+        self.blob = bytearray()
+
+    def scalar(self, value) -> int:
+        """Pool index of `value`, or -1 if it is not a scalar."""
+        kind = type(value)
+        if kind is str or kind is int:
+            key = value
+        elif kind is float:
+            key = DOUBLE.pack(value)
+        elif kind is bool or value is None:
+            key = (value,)
+        elif isinstance(value, str):
+            return self.scalar(str(value))
+        elif isinstance(value, Integral):
+            return self.scalar(int(value))
+        elif isinstance(value, Number):
+            return self.scalar(float(value))
+        else:
+            return -1
+        index = self.pool.get(key)
+        if index is None:
+            index = self.pool[key] = len(self.scalars)
+            self.scalars.append(value)
+        return index
+
+    def shape(self, keys) -> int:
+        refs = tuple(map(self.scalar, keys))
+        if -1 in refs:
+            raise TypeError("Only scalar keys can be written in FLPP binary")
+        index = self.shapes.get(refs)
+        if index is None:
+            index = self.shapes[refs] = len(self.shapes)
+        return index
+
+    def table(self, kind: int, size: int, values) -> tuple:
+        refs, height = [], 0
+        for value in values:
+            ref, below = self.value(value)
+            refs.append(ref)
+            if below > height:
+                height = below
+        self.nodes.append((height + 1, kind, size, refs))
+        return -len(self.nodes), height + 1
+
+    def stored(self, kind: int, sizes: tuple, data) -> tuple:
+        self.nodes.append((0, kind, sizes, None))
+        self.blob += data
+        return -len(self.nodes), 0
+
+    def value(self, obj) -> tuple:
+        """`(ref, height)` of `obj`: its pool index for a scalar, or -1 - its
+        index in `nodes`, and 0 or the height of the table."""
+        index = self.scalar(obj)
+        if index >= 0:
+            return index, 0
+        kind = type(obj)
+        if kind is dict:
+            return self.table(DICT, self.shape(obj), obj.values())
+        if kind is list or kind is tuple:
+            return self.table(LIST, len(obj), obj)
+        if kind is NamedTable:
+            return self.table(NAMED, 2, (str(obj.type), obj.fields))
+        if kind is array:
+            return self.stored(ARRAY, (len(obj),), doubles(obj))
+        if kind.__name__ == "ndarray":
+            data = obj.astype("<f8").tobytes()
+            return self.stored(NDARRAY, (obj.ndim, *obj.shape), data)
+        if isinstance(obj, (bytes, bytearray)):
+            return self.stored(BYTES, (len(obj),), obj)
+        raise TypeError(f"Cannot write {kind.__name__} values in FLPP binary")
+
+    def getvalue(self, root: int) -> bytes:
+        # the pool ordered by type
+        sections = ([], [], [], [])
+        places = []
+        for value in self.scalars[len(CONSTANTS) :]:
+            section = sections[pool_section(value)]
+            places.append((section, len(section)))
+            section.append(value)
+        starts = accumulate(map(len, sections), initial=len(CONSTANTS))
+        starts = dict(zip(map(id, sections), starts))
+        remap = list(range(len(CONSTANTS)))
+        remap += [starts[id(section)] + i for section, i in places]
+
+        # stored values in the order of the blob, then the tables by height
+        # and kind, in the order they were written within a group
+        nodes = self.nodes
+        order = sorted(
+            range(len(nodes)), key=lambda i: nodes[i][:2] if nodes[i][0] else (0,)
+        )
+        positions = [0] * len(nodes)
+        for position, node in enumerate(order, len(remap)):
+            positions[node] = position
+        ref = lambda r: remap[r] if r >= 0 else positions[-1 - r]
+        stored, groups, sizes, refs = [], [], [], []
+        group = None
+        for node in order:
+            height, kind, size, values = nodes[node]
+            if not height:
+                stored += (kind, *size)
+                continue
+            if group == (height, kind):
+                groups[-1] += 1
+            else:
+                groups += (kind, 1)
+                group = (height, kind)
+            if kind != NAMED:
+                sizes.append(size)
+            refs += map(ref, values)
+        refs.append(ref(root))
+
+        strings, ints, floats, bigints = sections
+        if any(SEPARATOR in string for string in strings):
+            lengths = array("I", map(len, strings))
+            text = "".join(strings)
+        else:
+            lengths = array("I")
+            text = SEPARATOR.join(strings)
+        text = text.encode("utf-8", "surrogatepass")
+        big = ",".join(map(str, bigints)).encode()
+        keys = indexes([remap[i] for shape in self.shapes for i in shape])
+        refs = indexes(refs)
+        header = indexes(stored + groups + sizes)
+
+        out = bytearray(MAGIC)
+        out.append(BINARY_VERSION)
+        out += SECTIONS.pack(
+            (keys.typecode + refs.typecode + header.typecode).encode(),
+            len(strings),
+            len(lengths),
+            len(text),
+            len(ints),
+            len(floats),
+            len(big),
+            len(self.shapes),
+            len(keys),
+            len(stored),
+            len(groups),
+            len(sizes),
+            len(refs),
+            len(self.blob),
+        )
+        out += little_endian(lengths)
+        out += text
+        out += little_endian(array("q", ints))
+        out += doubles(floats)
+        out += big
+        out += little_endian(array("I", map(len, self.shapes)))
+        out += little_endian(keys)
+        out += little_endian(header)
+        out += little_endian(refs)
+        out += self.blob
+        return bytes(out)
+
+
+class BinaryReader:
+    """Reads back what `BinaryWriter` wrote, from any bytes-like object."""
+
+    def __init__(self, data):
+        self.data = memoryview(data).cast("B")
+        if bytes(self.data[: len(MAGIC)]) != MAGIC:
+            raise ParseError("Not an FLPP binary file.")
+        version = self.data[len(MAGIC)]
+        if version != BINARY_VERSION:
+            raise ParseError(
+                f"FLPP binary version {version} is not supported, "
+                f"expected {BINARY_VERSION}."
+            )
+        self.pos = len(MAGIC) + 1
+
+    def raw(self, n: int) -> memoryview:
+        pos = self.pos
+        self.pos = pos + n
+        if self.pos > len(self.data):
+            raise ParseError("Unexpected end of FLPP binary data.")
+        return self.data[pos : self.pos]
+
+    def array(self, typecode: str, n: int, data=None) -> array:
+        values = array(typecode)
+        values.frombytes(self.raw(n * values.itemsize) if data is None else data)
+        if not LITTLE_ENDIAN:
+            values.byteswap()
+        return values
+
+    def value(self):
+        typecodes, *counts = SECTIONS.unpack_from(self.data, self.pos)
+        self.pos += SECTIONS.size
+        n_strings, n_lengths, n_text, n_ints, n_floats, n_big = counts[:6]
+        n_shapes, n_keys, n_stored, n_groups, n_sizes, n_refs, n_blob = counts[6:]
+        key_code, ref_code, header_code = typecodes.decode()
+
+        # the scalars, which tables refer to by index like to each other
+        objects = list(CONSTANTS)
+        lengths = self.array("I", n_lengths)
+        text = str(self.raw(n_text), "utf-8", "surrogatepass")
+        if n_lengths:
+            ends = accumulate(lengths)
+            strings = map(slice, accumulate(lengths, initial=0), ends)
+            strings = list(map(text.__getitem__, strings))
+        else:
+            strings = text.split(SEPARATOR) if n_strings else []
+        if len(strings) != n_strings:
+            raise ParseError("Corrupt FLPP binary data.")
+        objects += strings
+        objects += self.array("q", n_ints).tolist()
+        objects += self.array("d", n_floats).tolist()
+        if n_big:
+            objects += map(int, bytes(self.raw(n_big)).split(b","))
+        lengths = self.array("I", n_shapes)
+        keys = list(map(objects.__getitem__, self.array(key_code, n_keys)))
+        shapes = map(slice, accumulate(lengths, initial=0), accumulate(lengths))
+        shapes = list(map(keys.__getitem__, shapes))
+        stored = iter(self.array(header_code, n_stored))
+        groups = iter(self.array(header_code, n_groups))
+        sizes = iter(self.array(header_code, n_sizes))
+        refs = iter(self.array(ref_code, n_refs))
+        blob = self.raw(n_blob)
+
+        # values stored whole, in the order of the blob
+        pos = 0
+        for kind in stored:
+            if kind == NDARRAY:
+                if numpy is None:
+                    raise ImportError(
+                        "reading NumPy arrays requires NumPy to be installed"
+                    )
+                shape = tuple(islice(stored, next(stored)))
+                values = numpy.frombuffer(blob, "<f8", math.prod(shape), pos)
+                objects.append(values.astype(float).reshape(shape))
+                pos += values.nbytes
+                continue
+            n = next(stored)
+            if kind == ARRAY:
+                objects.append(self.array("d", 0, blob[pos : pos + 8 * n]))
+                pos += 8 * n
+            elif kind == BYTES:
+                objects.append(bytes(blob[pos : pos + n]))
+                pos += n
+            else:
+                raise ParseError(f"Unknown FLPP binary value kind {kind}.")
+
+        # the tables by height, all those of a kind at a time, each taking
+        # its values from the front of `values`: `zip` stops at the end of
+        # the keys and `islice` at the length without going further
+        values = map(objects.__getitem__, refs)
+        for kind, count in zip(groups, groups):
+            if kind == DICT:
+                keys = map(shapes.__getitem__, islice(sizes, count))
+                objects += map(dict, map(zip, keys, repeat(values)))
+            elif kind == LIST:
+                lengths = islice(sizes, count)
+                objects += map(list, map(islice, repeat(values), lengths))
+            elif kind == NAMED:
+                objects += starmap(NamedTable, islice(zip(values, values), count))
+            else:
+                raise ParseError(f"Unknown FLPP binary table kind {kind}.")
+        root = next(values)
+        rest = next(refs, None), next(sizes, None)
+        if rest != (None, None) or pos != len(blob):
+            raise ParseError("Corrupt FLPP binary data.")
+        return root
+
+
+def dumps_binary(obj) -> bytes:
+    writer = BinaryWriter()
+    root, _ = writer.value(obj)
+    return writer.getvalue(root)
+
+
+def loads_binary(data):
+    try:
+        return BinaryReader(data).value()
+    except (IndexError, ValueError, StopIteration, struct.error):
+        raise ParseError("Unexpected end of FLPP binary data.") from None
+
+
+def dump_binary(obj, fp):
+    """Write `obj` to the binary file object `fp` in the FLPP binary format."""
+    fp.write(dumps_binary(obj))
+
+
+def load_binary(fp):
+    """Read a tree written by `dump_binary` from the binary file object `fp`."""
+    return loads_binary(fp.read())
@@ -0,0 +1,127 @@
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+
+# bump when the decoded representation changes, so old entries are not reused
+CACHE_VERSION = 1
+DEFAULT_CACHE_SIZE = 1 << 30
+CACHE_SUFFIX = ".pickle"
+
+
+class DecodeCache:
+    """On-disk cache of decoded trees, keyed by content hash.
+
+    Entries are pickled into `directory`, one file per key. When the files
+    grow over `max_size` bytes, the least recently used ones are removed;
+    every hit refreshes the modification time of its file.
+
+    Files are written to a temporary name and renamed into place, and entries
+    removed by another process are treated as misses, so several processes
+    can share a directory.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.hits = self.misses = self.evictions = 0
+        self.bytes_read = self.bytes_written = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, key: str):
+        """Return `(True, value)` for a cached key, `(False, None)` otherwise."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            value = pickle.loads(data)
+        except (OSError, pickle.PickleError, EOFError):
+            with self._lock:
+                self.misses += 1
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self.bytes_read += len(data)
+        return True, value
+
+    def put(self, key: str, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp, self.path(key))
+        except OSError:
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.bytes_written += len(data)
+            if self._size is not None:
+                self._size += len(data)
+        if self._size is None or self._size > self.max_size:
+            self.evict()
+
+    def entries(self) -> list:
+        """`(mtime, size, path)` of the cached files, oldest first."""
+        entries = []
+        for path in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits `max_size`."""
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        evicted = 0
+        for _, file_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                path.unlink()
+                evicted += 1
+            except OSError:
+                pass
+            # removed here or by another process, either way it is gone
+            size -= file_size
+        with self._lock:
+            self._size = size
+            self.evictions += evicted
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "entries": len(entries),
+                "size": sum(entry[1] for entry in entries),
+            }
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from .flpp import flpp, FILE_HEADERS
+from .stats import ProfiledFLPP, Stats
+from .index import LibraryIndex, INDEX_FILE, file_hash
+
+LUA_EXTENSIONS = (".comp", ".setting", ".prefs", ".masterprefs")
+JSON_EXTENSION = ".json"
+STATE_FILE = ".flpp-convert.json"
+
+
+def target_for(source: Path, output_dir=None, root=None) -> Path:
+    """`scene.comp` converts to `scene.comp.json` and back."""
+    if source.suffix == JSON_EXTENSION:
+        name = source.stem
+    else:
+        name = source.name + JSON_EXTENSION
+    if output_dir is None:
+        return source.with_name(name)
+    relative = source.parent.relative_to(root) if root else Path()
+    return Path(output_dir) / relative / name
+
+
+def is_source(path: Path, to: str) -> bool:
+    """Fusion files are converted to JSON, `*.comp.json` like files to Lua."""
+    if to == "json":
+        return path.suffix in LUA_EXTENSIONS
+    return path.suffix == JSON_EXTENSION and Path(path.stem).suffix in LUA_EXTENSIONS
+
+
+def collect(patterns: list, to="json", output_dir=None):
+    """Yield `(source, target)` for files, directories and glob patterns."""
+    seen = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            root = path
+            files = sorted(path.rglob("*"))
+        else:
+            root = None
+            files = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        for source in files:
+            if not is_source(source, to) or not source.is_file():
+                continue
+            if source.resolve() in seen:
+                continue
+            seen.add(source.resolve())
+            yield source, target_for(source, output_dir, root)
+
+
+def convert_file(task):
+    """Convert one file, Lua to JSON or JSON to Lua.
+
+    `task` is `(source, target, known_hash, indent, profile)`. Errors are
+    returned in the result instead of raised, so one broken file does not stop
+    a batch. With `profile`, the `Stats` report of the file is added to it.
+    """
+    source, target, known_hash, indent, profile = task
+    result = {"source": str(source), "target": str(target), "error": None}
+    parser = ProfiledFLPP() if profile else flpp
+    try:
+        stat = os.stat(source)
+        result.update(mtime=stat.st_mtime, size=stat.st_size)
+        with open(source, "rb") as f:
+            raw = f.read()
+        result["hash"] = file_hash(raw)
+        if result["hash"] == known_hash and os.path.exists(target):
+            result["status"] = "skipped"
+            return result
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        if source.suffix == JSON_EXTENSION:
+            data = json.loads(raw.decode("utf-8"))
+            with open(target, "w", encoding="utf-8") as out:
+                parser.dump(data, out, header=FILE_HEADERS.get(target.suffix))
+        else:
+            data = parser.decode(raw)
+            with open(target, "w", encoding="utf-8") as out:
+                json.dump(data, out, indent=indent, sort_keys=False)
+        result["status"] = "converted"
+        if profile:
+            result["profile"] = parser.stats.to_dict()
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def load_state(path) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path, state: dict):
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+
+
+def unchanged(entry: dict, source: Path) -> bool:
+    """Quick check with the file stats, before reading anything."""
+    if not entry:
+        return False
+    stat = source.stat()
+    return entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size
+
+
+def add_profile(stats: Stats, result: dict):
+    """Add the profile of a converted file, with its largest tables named
+    after the file."""
+    report = result["profile"]
+    for entry in report["largest"]:
+        entry["path"] = f"{result['source']}:{entry['path']}"
+    stats.update(report)
+
+
+def convert(args, out=None, err=None) -> int:
+    out = out or sys.stdout
+    err = err or sys.stderr
+    state = {} if args.force else load_state(args.state)
+    tasks, skipped = [], 0
+    for source, target in collect(args.paths, args.to, args.output_dir):
+        entry = state.get(str(source), {})
+        if unchanged(entry, source) and target.exists():
+            skipped += 1
+            continue
+        tasks.append(
+            (source, target, entry.get("hash"), args.indent, bool(args.profile))
+        )
+
+    counts = {"converted": 0, "skipped": skipped, "failed": 0}
+    total_bytes = 0
+    stats = Stats()
+    start = time.perf_counter()
+    if args.jobs == 1:
+        results = map(convert_file, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=args.jobs)
+        results = pool.map(convert_file, tasks, chunksize=args.chunksize)
+    try:
+        for result in results:
+            counts[result["status"]] += 1
+            if result["error"]:
+                print(f"{result['source']}: {result['error']}", file=err)
+                continue
+            total_bytes += result["size"]
+            if "profile" in result:
+                add_profile(stats, result)
+            state[result["source"]] = {
+                key: result[key] for key in ("mtime", "size", "hash", "target")
+            }
+    finally:
+        if args.jobs != 1:
+            pool.shutdown()
+        save_state(args.state, state)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    if args.profile:
+        with open(args.profile, "w", encoding="utf-8") as f:
+            json.dump(dict(stats.to_dict(), seconds=elapsed), f, indent=4)
+
+    processed = counts["converted"] + counts["failed"]
+    print(
+        f"{counts['converted']} converted, {counts['skipped']} skipped, "
+        f"{counts['failed']} failed in {elapsed:.2f}s "
+        f"({processed / elapsed:.1f} files/s, {total_bytes / elapsed / 1e6:.2f} MB/s)",
+        file=out,
+    )
+    return 1 if counts["failed"] else 0
+
+
+def index(args, out=None, err=None) -> int:
+    out = out or sys.stdout
+    err = err or sys.stderr
+    with LibraryIndex(args.db) as library:
+        if args.action == "update":
+            start = time.perf_counter()
+            counts = library.update(args.paths, args.jobs, args.chunksize)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{counts['indexed']} indexed, {counts['unchanged']} unchanged, "
+                f"{counts['failed']} failed, {counts['removed']} removed "
+                f"in {elapsed:.2f}s",
+                file=out,
+            )
+            for path, error in library.errors().items():
+                print(f"{path}: {error}", file=err)
+            return 1 if counts["failed"] else 0
+        query = {
+            "reads": library.reading,
+            "writes": library.writing,
+            "uses": library.using,
+        }[args.query]
+        for path in query(args.pattern):
+            print(path, file=out)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="flpp", description="Fusion Lua data tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser(
+        "convert",
+        help="convert Fusion files to JSON and JSON files back to Fusion files",
+    )
+    command.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    command.add_argument(
+        "--to",
+        choices=("json", "lua"),
+        default="json",
+        help="convert Fusion files to JSON, or `*.comp.json` like files back to Lua",
+    )
+    command.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    command.add_argument(
+        "--chunksize", type=int, default=16, help="files sent to a worker at once"
+    )
+    command.add_argument(
+        "-o", "--output-dir", help="write results here instead of next to sources"
+    )
+    command.add_argument("--indent", type=int, default=4, help="JSON indentation")
+    command.add_argument(
+        "--state",
+        default=STATE_FILE,
+        help="file remembering converted sources, unchanged ones are skipped",
+    )
+    command.add_argument(
+        "-f", "--force", action="store_true", help="convert unchanged files too"
+    )
+    command.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write timers, token counts and the largest tables as JSON to PATH",
+    )
+    command.set_defaults(run=convert)
+
+    command = commands.add_parser(
+        "index", help="index the tools and media of comps in a SQLite database"
+    )
+    actions = command.add_subparsers(dest="action", required=True)
+    action = actions.add_parser(
+        "update", help="index new and changed comps and settings"
+    )
+    action.add_argument("paths", nargs="+", help="files or directories")
+    action.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    action.add_argument(
+        "--chunksize", type=int, default=16, help="files sent to a worker at once"
+    )
+    action = actions.add_parser("query", help="list the indexed files matching")
+    action.add_argument(
+        "query",
+        choices=("reads", "writes", "uses"),
+        help="files reading or writing a media file, or using a tool type",
+    )
+    action.add_argument("pattern", help='glob pattern, like "/shows/*/plate.*.exr"')
+    for action in actions.choices.values():
+        action.add_argument("--db", default=INDEX_FILE, help="index database")
+    command.set_defaults(run=index)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
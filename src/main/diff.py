@@ -0,0 +1,164 @@
+import copy
+from collections import namedtuple
+
+from .flpp import NamedTable, format_key_path, is_table, leaf_bytes, tree_digests
+
+ADDED, REMOVED, CHANGED = "added", "removed", "changed"
+
+
+class Change(namedtuple("Change", "kind path old new")):
+    """A value `ADDED`, `REMOVED` or `CHANGED` at the key path `path`, a tuple."""
+
+    __slots__ = ()
+
+    @property
+    def key_path(self) -> str:
+        return format_key_path(self.path)
+
+    def __str__(self):
+        return f"{self.kind} {self.key_path}: {self.old!r} -> {self.new!r}"
+
+
+class Conflict(namedtuple("Conflict", "path base ours theirs")):
+    """Both sides changed the value at `path`, or a table around it, differently."""
+
+    __slots__ = ()
+
+    @property
+    def key_path(self) -> str:
+        return format_key_path(self.path)
+
+
+def children(table):
+    if isinstance(table, NamedTable):
+        table = table.fields
+    if isinstance(table, dict):
+        return table
+    return dict(enumerate(table))
+
+
+def same_kind(a, b) -> bool:
+    if isinstance(a, NamedTable) or isinstance(b, NamedTable):
+        return (
+            isinstance(a, NamedTable)
+            and isinstance(b, NamedTable)
+            and a.type == b.type
+            and same_kind(a.fields, b.fields)
+        )
+    return isinstance(a, dict) == isinstance(b, dict)
+
+
+def same(a, b, digests_a: dict, digests_b: dict) -> bool:
+    if is_table(a) and is_table(b):
+        return digests_a[id(a)] == digests_b[id(b)]
+    if is_table(a) or is_table(b):
+        return False
+    return leaf_bytes(a) == leaf_bytes(b)
+
+
+def diff_trees(a, digests_a: dict, b, digests_b: dict) -> list:
+    """Changes from tree `a` to tree `b`, given the digests of their tables.
+
+    Tables are compared key by key, positional entries by index, and only
+    where their digests differ.
+    """
+    changes = []
+    stack = [((), a, b)]
+    while stack:
+        path, old, new = stack.pop()
+        if same(old, new, digests_a, digests_b):
+            continue
+        if not (is_table(old) and is_table(new) and same_kind(old, new)):
+            changes.append(Change(CHANGED, path, old, new))
+            continue
+        old_items, new_items = children(old), children(new)
+        for key in reversed(list(new_items)):
+            if key in old_items:
+                stack.append((path + (key,), old_items[key], new_items[key]))
+        for key, value in old_items.items():
+            if key not in new_items:
+                changes.append(Change(REMOVED, path + (key,), value, None))
+        for key, value in new_items.items():
+            if key not in old_items:
+                changes.append(Change(ADDED, path + (key,), None, value))
+    return changes
+
+
+def container(tree, path: tuple):
+    """The dict or list holding the value at `path`."""
+    for key in path[:-1]:
+        if isinstance(tree, NamedTable):
+            tree = tree.fields
+        tree = tree[key]
+    if isinstance(tree, NamedTable):
+        tree = tree.fields
+    return tree
+
+
+def apply_change(tree, change: Change):
+    if not change.path:
+        return copy.deepcopy(change.new)
+    parent, key = container(tree, change.path), change.path[-1]
+    if change.kind == REMOVED:
+        del parent[key]
+    elif isinstance(parent, list) and key >= len(parent):
+        parent.append(copy.deepcopy(change.new))
+    else:
+        parent[key] = copy.deepcopy(change.new)
+    return tree
+
+
+def merge_trees(base, ours, theirs):
+    """Three-way merge of `(tree, digests)` pairs, as returned by `FLPP.hashed`.
+
+    Starts from our tree and applies their changes to it. Changes of the same
+    value, or of a value inside a table the other side changed, conflict
+    unless both sides made them the same way; conflicts keep our side.
+    Returns the merged tree and the list of `Conflict`s.
+    """
+    our_changes = {change.path: change for change in diff_trees(*base, *ours)}
+    their_changes = diff_trees(*base, *theirs)
+    # paths of the tables our changes are in
+    our_tables = {path[:i] for path in our_changes for i in range(len(path))}
+
+    merged = copy.deepcopy(ours[0])
+    conflicts = []
+    removals = []
+    for change in their_changes:
+        path = change.path
+        mine = our_changes.get(path)
+        if mine is not None:
+            if mine.kind == change.kind and same_value(mine.new, change.new):
+                continue
+        elif path not in our_tables and not any(
+            path[:i] in our_changes for i in range(len(path))
+        ):
+            if change.kind == REMOVED:
+                removals.append(change)
+            else:
+                merged = apply_change(merged, change)
+            continue
+        conflicts.append(Conflict(path, change.old, lookup(ours[0], path), change.new))
+    # remove from the end, so positional indexes stay valid
+    removals.sort(
+        key=lambda change: change.path[-1] if isinstance(change.path[-1], int) else -1,
+        reverse=True,
+    )
+    for change in removals:
+        merged = apply_change(merged, change)
+    return merged, conflicts
+
+
+def same_value(a, b) -> bool:
+    if is_table(a) and is_table(b):
+        digests_a, digests_b = tree_digests(a), tree_digests(b)
+        return digests_a[id(a)] == digests_b[id(b)]
+    return not is_table(a) and not is_table(b) and leaf_bytes(a) == leaf_bytes(b)
+
+
+def lookup(tree, path: tuple):
+    """The value at `path`, or None."""
+    try:
+        return container(tree, path)[path[-1]] if path else tree
+    except (KeyError, IndexError, TypeError):
+        return None
@@ -1,9 +1,22 @@
+import os
 import re
+import mmap
 import sys
 import json
+import pickle
+import hashlib
+import threading
+from array import array
+from fnmatch import fnmatchcase
 from numbers import Number
 from pathlib import Path
 
+from .cache import DecodeCache, CACHE_VERSION, DEFAULT_CACHE_SIZE
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 ERRORS = {
     "unexp_end_string": "Unexpected end of string while parsing Lua string.",
@@ -14,113 +27,511 @@ ERRORS = {
 }
 
 
+ENGINES = ("regex", "char")
+ARRAY_TYPES = (None, "array", "numpy")
+INTERN_MODES = (None, "keys", "values")
+# keys and names repeated all over comps, interned along with the registry IDs
+COMMON_KEYS = (
+    "Tools",
+    "Inputs",
+    "Input",
+    "Value",
+    "Source",
+    "SourceOp",
+    "ViewInfo",
+    "OperatorInfo",
+    "Pos",
+    "Clips",
+    "Clip",
+    "Filename",
+    "FormatID",
+    "CtrlWZoom",
+    "NameSet",
+    "KeyFrames",
+    "Flags",
+    "LH",
+    "RH",
+    "Width",
+    "Height",
+    "Center",
+    "Size",
+    "Blend",
+    "Gain",
+    "Name",
+    "ID",
+    "Links",
+    "Views",
+    "Prefs",
+    "Comp",
+    "FuID",
+    "Number",
+    "Point",
+    "Polyline",
+    "BezierSpline",
+    "Instance",
+    "SourceInput",
+    "Expression",
+    "ExtentSet",
+    "GlobalIn",
+    "GlobalOut",
+    "TrimIn",
+    "TrimOut",
+    "ClipTimeStart",
+    "ClipTimeEnd",
+    "CustomData",
+    "UserControls",
+)
+READ_CHUNK_SIZE = DUMP_CHUNK_SIZE = 1 << 16
+# top level constructors written in front of the root table
+FILE_HEADERS = {".comp": "Composition"}
+REGISTRY_ENV = "FLPP_REGISTRY"
+REGISTRY_PATH = Path(__file__).parent / "utils" / "fusion_registry_list.json"
+# suffix of the registry caches `load_registry` writes, the only files it
+# reads back or removes
+REGISTRY_CACHE_SUFFIX = ".flpp-registry.pickle"
+
+# patterns used by the regex engine to consume whole runs with a single slice
+WHITE_RUN = re.compile(r"(?:\s+|--(?:\[\[(?s:.*?)(?:\]\]|\Z)|[^\n]*))*")
+WORD_RUN = re.compile(r"[\w().]*")
+DIGITS = re.compile(r"\d+")
+HEX_DIGITS = re.compile(r"[0-9A-Fa-f]*")
+SKIP_STOP = re.compile(r"[{}\"'\[-]")
+BRACKETED_KEY = re.compile(r"^\d\D|^!|\.\D")
+# segments of key paths like Tools.exr.Clips[0]["Gamut.SLogVersion"]
+KEY_PATH_SEGMENT = re.compile(r'\[(\d+)\]|\["([^"]*)"\]|([^.\[\]]+)')
+# keys written without brackets by `format_key_path`
+PLAIN_KEY = re.compile(r"[^.\[\]\"]+")
+# a whole table of decimal numbers, like { 1001, -0.5, 2e+3, }
+NUMBER_ITEM = r"\s*-?\d+(?:\.\d+)?(?:[eE][+-]\d+)?\s*"
+NUMERIC_TABLE = re.compile(rf"\{{({NUMBER_ITEM}(?:,{NUMBER_ITEM})*),?\s*\}}")
+# the same patterns for `ByteReader`, matching ASCII syntax in bytes
+WHITE_RUN_BYTES = re.compile(WHITE_RUN.pattern.encode())
+# non-ASCII bytes are taken whole, `ByteReader.word` trims the decoded word
+WORD_RUN_BYTES = re.compile(rb"[\w().\x80-\xff]*")
+SKIP_STOP_BYTES = re.compile(SKIP_STOP.pattern.encode())
+NUMERIC_TABLE_BYTES = re.compile(NUMERIC_TABLE.pattern.encode())
+QUOTED_BYTES = {
+    quote: re.compile(rf"[^{quote}\\]*(?:\\.[^{quote}\\]*)*{quote}".encode(), re.S)
+    for quote in "\"'"
+}
+LONG_STRING_END = re.compile(rb"\]\]")
+ESCAPED = re.compile(r"\\(.)", re.S)
+# a constructor like `Composition` in front of the root table
+HEADER = re.compile(r"\s*[A-Za-z_]\w*\s*(?=\{)")
+# integral doubles below this are written back without a fraction
+MAX_EXACT_INT = 1 << 53
+
+
 class ParseError(Exception):
     pass
 
 
-class FLPP:
-    def __init__(self):
-        self.text = ""
-        self.ch = ""
-        self.at = 0
-        self.len = 0
-        self.depth = 0
-        self.space = re.compile("\s", re.M)
-        self.newline = "\n"
-        self.tab = "\t"
-        self.named_table_pattern = self.fill_named_tables()
+# returned by `Reader.item` when a table constructor starts at the cursor
+TABLE = object()
 
-    def fill_named_tables(self):
-        regs_path = Path("src/main/utils/fusion_registry_list.json")
-        with open(regs_path.as_posix(), "r") as reg:
-            ordered_table_value = "ordered()"
-            named_tables = json.load(reg)
-            named_tables.append(ordered_table_value)
-        return self.build_escaped_regex(named_tables)
-
-    def build_escaped_regex(self, patterns: list):
-        table_pattern = "|".join([re.escape(pattern) for pattern in patterns])
-        return re.compile(f'"({table_pattern})"' + "\,(\n\t+\{)")
-
-    def decode(self, text):
-        if not text or not isinstance(text, str):
-            return
-        self.text = text
-        self.at, self.ch, self.depth = 0, "", 0
-        self.len = len(text)
+
+BOOL_WORDS = {"true": True, "false": False, "nil": None}
+BYTES_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+UTF8_BOM = b"\xef\xbb\xbf"
+# characters of bytes for `ByteReader`, non-ASCII ones only appear in strings
+BYTE_CHARS = [chr(i) for i in range(128)] + ["\x80"] * 128
+
+
+class NamedTable:
+    """A table built with a constructor, like `Loader { ... }` or `ordered() { ... }`.
+
+    Decoded by `FLPP(nodes=True)` in place of the name and table pair of the
+    default representation. `fields` is a dict, or a list for positional tables.
+    """
+
+    __slots__ = ("type", "fields")
+
+    def __init__(self, type: str, fields):
+        self.type = type
+        self.fields = fields
+
+    def __repr__(self):
+        return f"NamedTable({self.type!r}, {self.fields!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, NamedTable):
+            return NotImplemented
+        return self.type == other.type and self.fields == other.fields
+
+    __hash__ = None
+
+
+class Reader:
+    """Slice-based Lua lexer over a string or a text file object.
+
+    The cursor follows the same convention as the char engine of `FLPP`:
+    `ch` is the current character and `at` is the index right after it.
+    File objects are read in chunks; consumed text is dropped from the buffer,
+    except the character before the cursor, which is needed by `prev_is`.
+    """
+
+    bool_words = BOOL_WORDS
+    white_run = WHITE_RUN
+    skip_stop = SKIP_STOP
+
+    def __init__(self, source, chunk_size=READ_CHUNK_SIZE):
+        if isinstance(source, str):
+            self.fp, self.text, self.eof = None, source, True
+        else:
+            self.fp, self.text, self.eof = source, "", False
+        self.chunk_size = chunk_size
+        self.len = len(self.text)
+        # characters dropped from the front of the buffer so far
+        self.offset = 0
+        self.at, self.ch = 0, ""
         self.next_chr()
-        result = self.item()
-        return result
 
-    def encode(self, obj):
-        self.depth = 0
-        return self._encode(obj)
+    def fill(self) -> int:
+        """Read the next chunk, return by how much the buffer indexes shifted."""
+        if self.eof:
+            return 0
+        shift = max(self.at - 2, 0)
+        # grow the read size with the pending text, so long tokens stay linear
+        chunk = self.fp.read(max(self.chunk_size, self.len - shift))
+        if not chunk:
+            self.eof = True
+        self.text = self.text[shift:] + chunk
+        self.len = len(self.text)
+        self.at -= shift
+        self.offset += shift
+        return shift
+
+    def tell(self) -> int:
+        """Offset of the cursor in the whole source."""
+        if self.ch is None:
+            return self.offset + self.at
+        return self.offset + self.at - 1
 
-    def _check_length(self, obj) -> bool:
-        length_numbers = [
-            x
-            for x in obj
-            if isinstance(x, Number) or (isinstance(x, str) and len(x) < 10)
-        ]
-        return len(length_numbers) == len(obj)
+    def seek(self, pos):
+        """Move the cursor so that `self.ch` is the character at `pos`."""
+        while pos >= self.len and not self.eof:
+            pos -= self.fill()
+        if pos < self.len:
+            self.ch = self.text[pos]
+            self.at = pos + 1
+        else:
+            self.ch = None
+            self.at = self.len
 
-    def _build_keys(self, obj: dict):
-        for key in obj.keys():
-            if isinstance(key, int):
-                yield key
-            elif isinstance(key, str) and ":" in key or re.search("^\d\D|^!|\.\D", key):
-                # parse bracketed keys, such as ["Gamut.SLogVersion"] or ["!Left"]
-                yield f'["{key}"]'
+    def next_chr(self):
+        self.seek(self.at)
+        return self.ch is not None
+
+    def next_is(self, value):
+        if self.at >= self.len:
+            self.fill()
+            if self.at >= self.len:
+                return False
+        return self.text[self.at] == value
+
+    def prev_is(self, value: str):
+        if self.at < 2:
+            return False
+        return self.text[self.at - 2] == value
+
+    def white(self):
+        # skips whitespace and `--` / `--[[ ]]` comments in one match
+        ch = self.ch
+        if ch is None or not (ch == "-" or ch.isspace()):
+            return
+        end = self.white_run.match(self.text, self.at - 1).end()
+        while end >= self.len - 1 and not self.eof:
+            # a comment or a run of spaces may continue in the next chunk
+            self.fill()
+            end = self.white_run.match(self.text, self.at - 1).end()
+        self.seek(end)
+
+    def item(self):
+        self.white()
+        ch = self.ch
+        if not ch:
+            return
+        if ch == "{":
+            return TABLE
+        if ch == "[":
+            self.next_chr()
+            ch = self.ch
+            if ch is None:
+                return
+        if ch in ('"', "'", "["):
+            return self.string(ch)
+        if ch.isdigit() or ch == "-":
+            # handle braketed key format in the FloatView settings
+            if self.prev_is("["):
+                return f"[{self.number()}]"
+            return self.number()
+        return self.word()
+
+    def string(self, end=None):
+        start = self.ch
+        if start == "[":
+            if not self.prev_is(start):
+                raise ParseError(ERRORS["unexp_end_string"])
+            close = self.text.find("]]", self.at)
+            while close < 0 and not self.eof:
+                self.fill()
+                close = self.text.find("]]", self.at)
+            if close < 0:
+                raise ParseError(ERRORS["unexp_end_string"])
+            result = self.text[self.at : close]
+            self.seek(close + 2)
+            return result
+        parts = []
+        while True:
+            text, pos = self.text, self.at
+            close = text.find(start, pos)
+            escape = text.find("\\", pos, self.len if close < 0 else close)
+            if 0 <= escape < self.len - 1:
+                parts.append(text[pos:escape])
+                escaped = text[escape + 1]
+                if escaped != start:
+                    parts.append("\\")
+                parts.append(escaped)
+                self.seek(escape + 1)
+            elif escape < 0 <= close:
+                parts.append(text[pos:close])
+                self.seek(close + 1)
+                return "".join(parts)
+            elif self.eof:
+                raise ParseError(ERRORS["unexp_end_string"])
             else:
-                yield f"{key}"
+                # the literal continues in the next chunk
+                stop = self.len if escape < 0 else escape
+                parts.append(text[pos:stop])
+                self.seek(stop - 1)
+                self.fill()
 
-    def _build_content(self, indent, key_list, obj):
-        result = ""
-        for (_, value), key in zip(obj.items(), key_list):
-            try:
-                int(key)
-                # remove temporary numeric keys
-                result = f"{indent}{self._encode(value)}"
-            except ValueError:
-                result = f"{indent}{key} = {self._encode(value)}"
-            yield result
+    def numeric_table(self):
+        """Scan a table made only of decimal numbers at the cursor in one match.
 
-    def _encode(self, obj):
-        s = ""
-        # print(f"encoding: {obj}")
-        tab = self.tab
-        newline = self.newline
-
-        if isinstance(obj, str):
-            s += f'"{obj}"'
-        elif isinstance(obj, bytes):
-            s += '"{}"'.format("".join(r"\x{:02x}".format(c) for c in obj))
-        elif isinstance(obj, bool):
-            s += str(obj).lower()
-        elif obj is None:
-            s += "nil"
-        elif isinstance(obj, Number):
-            s += str(obj)
-        elif isinstance(obj, (list, tuple, dict)):
-            self.depth += 1
-            if len(obj) == 0 or (not isinstance(obj, dict) and self._check_length(obj)):
-                newline = tab = ""
-            indent = tab * self.depth
-            s += "{%s" % newline
-            if isinstance(obj, dict):
-                key_list = self._build_keys(obj)
-                contents = self._build_content(indent, key_list, obj)
-                s += (f",{newline}").join(list(contents))
+        Returns the floats, or None if the table holds anything else or does
+        not end within the buffer, to be parsed item by item instead.
+        """
+        match = NUMERIC_TABLE.match(self.text, self.at - 1)
+        if match is None:
+            return None
+        self.seek(match.end())
+        return array("d", map(float, match.group(1).split(",")))
+
+    def skip_table(self):
+        """Step over the table at the cursor, skipping strings and comments."""
+        depth = 0
+        while True:
+            ch = self.ch
+            if ch is None:
+                raise ParseError(ERRORS["unexp_end_table"])
+            if ch == "{":
+                depth += 1
+                self.next_chr()
+            elif ch == "}":
+                depth -= 1
+                self.next_chr()
+                if depth == 0:
+                    return
+            elif ch in ('"', "'"):
+                self.string(ch)
+            elif ch == "[":
+                self.next_chr()
+                if self.ch == "[":
+                    self.string("[")
+            elif self.next_is("-"):
+                self.white()
             else:
-                s += (f",{newline}").join(
-                    [indent + self._encode(element) for element in obj]
-                )
-            self.depth -= 1
-            s += f"{newline}{tab * self.depth}" + "}"
+                self.next_chr()
+            match = self.skip_stop.search(self.text, self.at - 1)
+            while match is None and not self.eof:
+                self.seek(self.len - 1)
+                self.fill()
+                match = self.skip_stop.search(self.text, self.at - 1)
+            self.seek(match.start() if match else self.len)
+
+    def word(self):
+        end = WORD_RUN.match(self.text, self.at).end()
+        while end >= self.len and not self.eof:
+            self.fill()
+            end = WORD_RUN.match(self.text, self.at).end()
+        result_string = self.text[self.at : end]
+        if self.ch != "\n":
+            result_string = self.ch + result_string
+        # the char engine stops as soon as the word reads as a bool or nil
+        for word in self.bool_words:
+            if result_string.startswith(word):
+                end -= len(result_string) - len(word)
+                result_string = word
+                break
+        self.seek(end)
+        return self.bool_words.get(result_string, result_string)
+
+    def number(self):
+        num, end, error = scan_number(self.text, self.at - 1)
+        while end >= self.len and not self.eof:
+            self.fill()
+            num, end, error = scan_number(self.text, self.at - 1)
+        self.seek(end)
+        return self.number_value(num, error)
+
+    @staticmethod
+    def number_value(num: str, error):
+        if error:
+            print(ERRORS[error])
+            return 0
+        try:
+            return int(num, 0)
+        except:
+            pass
+        return float(num)
+
+
+class ByteReader(Reader):
+    """`Reader` over a whole bytes-like buffer: `bytes`, `memoryview` or `mmap`.
+
+    The Lua syntax is matched on the bytes directly and only the contents of
+    string literals and words are decoded, so the source is never copied.
+    """
+
+    white_run = WHITE_RUN_BYTES
+    skip_stop = SKIP_STOP_BYTES
+
+    def __init__(self, source):
+        if isinstance(source, memoryview) and source.format != "B":
+            source = source.cast("B")
+        self.fp, self.text, self.eof = None, source, True
+        self.len = len(source)
+        self.offset = 0
+        # a UTF-8 byte order mark is skipped, offsets still count it
+        self.at = len(UTF8_BOM) if source[: len(UTF8_BOM)] == UTF8_BOM else 0
+        self.ch = ""
+        self.next_chr()
+
+    def slice(self, start: int, end: int) -> str:
+        return bytes(self.text[start:end]).decode("utf-8")
+
+    def seek(self, pos):
+        if pos < self.len:
+            self.ch = BYTE_CHARS[self.text[pos]]
+            self.at = pos + 1
+        else:
+            self.ch = None
+            self.at = self.len
+
+    def next_is(self, value):
+        return self.at < self.len and BYTE_CHARS[self.text[self.at]] == value
+
+    def prev_is(self, value: str):
+        return self.at >= 2 and BYTE_CHARS[self.text[self.at - 2]] == value
+
+    def string(self, end=None):
+        start = self.ch
+        if start == "[":
+            if not self.prev_is(start):
+                raise ParseError(ERRORS["unexp_end_string"])
+            match = LONG_STRING_END.search(self.text, self.at)
+            if match is None:
+                raise ParseError(ERRORS["unexp_end_string"])
+            result = self.slice(self.at, match.start())
+            self.seek(match.end())
+            return result
+        match = QUOTED_BYTES[start].match(self.text, self.at)
+        if match is None:
+            raise ParseError(ERRORS["unexp_end_string"])
+        result = self.slice(self.at, match.end() - 1)
+        if "\\" in result:
+            # only escaped quotes lose their backslash, like in `Reader.string`
+            result = ESCAPED.sub(
+                lambda m: m[1] if m[1] == start else m[0],
+                result,
+            )
+        self.seek(match.end())
+        return result
+
+    def numeric_table(self):
+        match = NUMERIC_TABLE_BYTES.match(self.text, self.at - 1)
+        if match is None:
+            return None
+        self.seek(match.end())
+        return array("d", map(float, match.group(1).split(b",")))
+
+    def word(self):
+        end = WORD_RUN_BYTES.match(self.text, self.at).end()
+        start = self.at if self.ch == "\n" else self.at - 1
+        result_string = self.slice(start, end)
+        if not result_string.isascii():
+            # the run took every non-ASCII character, stop where `Reader` does
+            word_end = WORD_RUN.match(result_string, 1 if start < self.at else 0).end()
+            end -= len(result_string[word_end:].encode("utf-8"))
+            result_string = result_string[:word_end]
+        for word in self.bool_words:
+            if result_string.startswith(word):
+                end -= len(result_string) - len(word)
+                result_string = word
+                break
+        self.seek(end)
+        return self.bool_words.get(result_string, result_string)
+
+    def number(self):
+        # numbers are short, scan them in a small decoded window
+        pos, size = self.at - 1, 32
+        while True:
+            window = bytes(self.text[pos : pos + size]).decode("latin-1")
+            num, end, error = scan_number(window, 0)
+            if end < len(window) or pos + size >= self.len:
+                break
+            size *= 2
+        self.seek(pos + end)
+        return self.number_value(num, error)
 
-        # remove commas from the named tables, like ordered(), MultiView etc.
-        output = self.named_table_pattern.sub(r"\1\2", s)
-        return output
+
+def scan_number(text: str, pos: int):
+    """Match a number at `pos` following the rules of `FLPP.number`.
+
+    Returns the number string, the index of the first character that was not
+    consumed and an `ERRORS` key for malformed numbers.
+    """
+    end = pos
+    if text.startswith("-", end):
+        end += 1
+        if not DIGITS.match(text, end):
+            return "", end, "mfnumber_minus"
+    end = DIGITS.match(text, end).end()
+    if text[pos:end] == "0" and text.startswith(("x", "X"), end):
+        end = HEX_DIGITS.match(text, end + 1).end()
+        return text[pos:end], end, None
+    if text.startswith(".", end):
+        end += 1
+        if not DIGITS.match(text, end):
+            return "", end, "mfnumber_dec_point"
+        end = DIGITS.match(text, end).end()
+    if text.startswith(("e", "E"), end):
+        end += 1
+        if not text.startswith(("+", "-"), end):
+            return "", end, "mfnumber_sci"
+        end += 1
+        if not DIGITS.match(text, end):
+            return "", end, "mfnumber_sci"
+        end = DIGITS.match(text, end).end()
+    return text[pos:end], end, None
+
+
+class CharReader:
+    """The original char-by-char parser, used by the "char" engine.
+
+    All the parsing state lives here, every decode call gets its own reader.
+    """
+
+    bool_words = BOOL_WORDS
+    space = re.compile(r"\s", re.M)
+
+    def __init__(self, text: str, finish_table):
+        self.text = text
+        self.at, self.ch, self.depth = 0, "", 0
+        self.len = len(text)
+        self.finish_table = finish_table
+        self.next_chr()
 
     def white(self):
         while self.ch:
@@ -203,69 +614,73 @@ class FLPP:
                 s += self.ch
         raise ParseError(ERRORS["unexp_end_string"])
 
-    @staticmethod
-    def table_object_keys(table_object):
-        return [
-            key for key in table_object if isinstance(key, (str, float, bool, tuple))
-        ]
-
-    def _empty_keys_to_list(self, table_object: dict):
-        empty_keys_values = []
-        for key in table_object:
-            empty_keys_values.insert(key, table_object[key])
-        return empty_keys_values
-
     def table_object(self):
-        output = {}
-        key = None
-        idx = 0
-        self.depth += 1
-        self.next_chr()
-        self.white()
-        if self.ch and self.ch == "}":
-            self.depth -= 1
+        """Parse the table at the cursor and every table inside it.
+
+        Open tables are kept on an explicit stack rather than parsed by
+        recursion, so nesting is not limited by the Python stack.
+        """
+        # [output, pending key, next positional index, key in parent] of the
+        # open tables, the innermost last
+        stack = []
+        slot = None
+        while True:
+            # the cursor is on the opening brace of a table
+            self.depth += 1
             self.next_chr()
-            return output
-        else:
-            while self.ch:
+            self.white()
+            if self.ch and self.ch == "}":
+                self.depth -= 1
+                self.next_chr()
+                value = {}
+            else:
+                stack.append([{}, None, 0, slot])
+                value = None
+            # parse until a new table opens or the outermost one is closed
+            while True:
+                if value is not None:
+                    if not stack:
+                        return value
+                    stack[-1][0][slot] = value
+                    value = None
+                if not self.ch:
+                    raise ParseError(ERRORS["unexp_end_table"])
+                frame = stack[-1]
+                output = frame[0]
                 self.white()
                 if self.ch == "{":
-                    output[idx] = self.table_object()
-                    idx += 1
-                    continue
+                    slot = frame[2]
+                    frame[2] += 1
+                    break
                 elif self.ch == "}":
                     self.depth -= 1
                     self.next_chr()
-                    if key is not None:  # see last zero test
-                        output[idx] = key
-                    # fix Loader clip parsing
-                    if output.get(1) == "Clip":
-                        output = {0: "Clip", 1: output[0]}
-                    elif len(self.table_object_keys(output)) == 0:
-                        output = self._empty_keys_to_list(output)
-                    return output
+                    if frame[1] is not None:  # see last zero test
+                        output[frame[2]] = frame[1]
+                    stack.pop()
+                    slot = frame[3]
+                    value = self.finish_table(output)
+                elif self.ch == ",":
+                    self.next_chr()
                 else:
-                    if self.ch == ",":
+                    frame[1] = self.item()
+                    if self.ch == "]":
                         self.next_chr()
-                        continue
-                    else:
-                        key = self.item()
-                        if self.ch == "]":
-                            self.next_chr()
                     self.white()
                     ch = self.ch
                     if ch in ("=", ","):
                         self.next_chr()
                         self.white()
-                        if ch == "=":
-                            output[key] = self.item()
+                        key, frame[1] = frame[1], None
+                        index = frame[2]
+                        frame[2] += 1
+                        if ch == ",":
+                            output[index] = key
+                        elif self.ch == "{":
+                            slot = key
+                            break
                         else:
-                            output[idx] = key
-                        idx += 1
-                        key = None
-        raise ParseError(ERRORS["unexp_end_table"])
-
-    bool_words = {"true": True, "false": False, "nil": None}
+                            output[key] = self.item()
 
     def word(self):
         result_string = ""
@@ -334,6 +749,1003 @@ class FLPP:
         return num
 
 
+def load_registry(path: Path) -> frozenset:
+    """Load the named table IDs from a registry list JSON file.
+
+    The resulting set is pickled next to the file, keyed by the hash of its
+    contents, so rebuilt registries are picked up and unchanged ones load fast.
+    Caches of older contents are removed; only files named like the ones
+    written here are touched. Read-only locations simply skip the cache.
+    """
+    path = Path(path)
+    data = path.read_bytes()
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    cache = path.with_name(f"{path.stem}.{digest}{REGISTRY_CACHE_SUFFIX}")
+    try:
+        with open(cache, "rb") as f:
+            named_tables = pickle.load(f)
+        if isinstance(named_tables, frozenset):
+            return named_tables
+    except (OSError, pickle.PickleError, EOFError):
+        pass
+    named_tables = json.loads(data)
+    named_tables.append("ordered()")
+    named_tables = frozenset(named_tables)
+    stale = re.compile(
+        rf"{re.escape(path.stem)}\.[0-9a-f]{{16}}{re.escape(REGISTRY_CACHE_SUFFIX)}"
+    )
+    try:
+        for other in path.parent.iterdir():
+            if other.name != cache.name and stale.fullmatch(other.name):
+                other.unlink()
+        with open(cache, "wb") as f:
+            pickle.dump(named_tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+    return named_tables
+
+
+# how a key path relates to the `select` patterns of `FLPP.decode`
+UNSELECTED, ON_PATH, SELECTED = range(3)
+
+
+def compile_paths(select) -> list:
+    """Split key path patterns like "Tools.*.Inputs" into tuples of segments.
+
+    Patterns may also be given as sequences of segments, for keys with dots.
+    """
+    return [
+        tuple(pattern.split(".")) if isinstance(pattern, str) else tuple(pattern)
+        for pattern in select
+    ]
+
+
+def parse_key_path(path) -> tuple:
+    """Split a key path like "Tools.exr.Clips[0].Filename" into its keys.
+
+    `[0]` segments are positional indexes and `["a.b"]` segments are keys
+    with dots. Sequences of keys are returned as a tuple unchanged.
+    """
+    if not isinstance(path, str):
+        return tuple(path)
+    return tuple(
+        int(index) if index else quoted or name
+        for index, quoted, name in KEY_PATH_SEGMENT.findall(path)
+    )
+
+
+def format_key_path(path) -> str:
+    """Write a tuple of keys as a key path that `parse_key_path` reads back."""
+    parts = []
+    for key in path:
+        if isinstance(key, int):
+            parts.append(f"[{key}]")
+        elif PLAIN_KEY.fullmatch(str(key)):
+            parts.append(f".{key}" if parts else str(key))
+        else:
+            parts.append(f'["{key}"]')
+    return "".join(parts)
+
+
+def is_table(value) -> bool:
+    return isinstance(value, (dict, list, tuple, NamedTable))
+
+
+def leaf_bytes(value) -> bytes:
+    """Canonical bytes of a value that is not a table, for hashing."""
+    if isinstance(value, array) or type(value).__name__ == "ndarray":
+        return type(value).__name__.encode() + value.tobytes()
+    return repr(value).encode()
+
+
+def table_digest(table, digests: dict) -> bytes:
+    """Merkle hash of a decoded table, from the digests of its nested tables.
+
+    `digests` maps the `id` of already hashed nested tables to their digest;
+    the digest of `table` is added to it and returned.
+    """
+    if isinstance(table, NamedTable):
+        fields = digests.get(id(table.fields))
+        if fields is None:
+            fields = table_digest(table.fields, digests)
+        digest = hashlib.sha1(b"N" + table.type.encode() + b"\0" + fields).digest()
+        digests[id(table)] = digest
+        return digest
+    if isinstance(table, dict):
+        items, hasher = table.items(), hashlib.sha1(b"D")
+    else:
+        items, hasher = enumerate(table), hashlib.sha1(b"L")
+    for key, value in items:
+        key = repr(key).encode()
+        hasher.update(b"%d:%s" % (len(key), key))
+        if is_table(value):
+            digest = digests.get(id(value)) or table_digest(value, digests)
+            hasher.update(b"T" + digest)
+        else:
+            value = leaf_bytes(value)
+            hasher.update(b"V%d:%s" % (len(value), value))
+    digest = hasher.digest()
+    digests[id(table)] = digest
+    return digest
+
+
+def tree_digests(obj) -> dict:
+    """Digests of every table in a decoded tree, by `id`, see `table_digest`."""
+    digests = {}
+    # post-order walk, nested tables are hashed before the tables holding them
+    stack = [(obj, False)]
+    while stack:
+        value, visited = stack.pop()
+        if not is_table(value) or id(value) in digests:
+            continue
+        if visited:
+            table_digest(value, digests)
+            continue
+        stack.append((value, True))
+        if isinstance(value, NamedTable):
+            stack.append((value.fields, False))
+        else:
+            children = value.values() if isinstance(value, dict) else value
+            stack.extend((child, False) for child in children)
+    return digests
+
+
+def match_path(patterns: list, path: tuple) -> int:
+    """Check if `path` is SELECTED by, ON_PATH to, or UNSELECTED by `patterns`."""
+    result = UNSELECTED
+    for pattern in patterns:
+        size = min(len(pattern), len(path))
+        if all(
+            segment == "*" or fnmatchcase(str(key), segment)
+            for segment, key in zip(pattern[:size], path[:size])
+        ):
+            if len(pattern) <= len(path):
+                return SELECTED
+            result = ON_PATH
+    return result
+
+
+class FLPP:
+    """Lua data parser and writer for Fusion files.
+
+    An instance only holds configuration, all parsing and encoding state is
+    local to each call, so one instance can be shared between threads.
+    """
+
+    def __init__(
+        self, engine="regex", registry=None, nodes=False, arrays=None, intern=None
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+        if nodes and engine != "regex":
+            raise ValueError("nodes=True requires the regex engine")
+        if intern not in INTERN_MODES:
+            raise ValueError(
+                f"Unknown intern {intern!r}, expected one of {INTERN_MODES}"
+            )
+        if intern and engine != "regex":
+            raise ValueError("intern requires the regex engine")
+        if arrays not in ARRAY_TYPES:
+            raise ValueError(
+                f"Unknown arrays {arrays!r}, expected one of {ARRAY_TYPES}"
+            )
+        if arrays == "numpy" and numpy is None:
+            raise ImportError("arrays='numpy' requires NumPy to be installed")
+        self.engine = engine
+        self.nodes = nodes
+        self.arrays = arrays
+        self.intern = intern
+        self.newline = "\n"
+        self.tab = "\t"
+        self.registry = registry
+        self._named_tables = None
+        self._registered = frozenset()
+        self._intern_table = None
+        self._registry_lock = threading.Lock()
+
+    def __getstate__(self):
+        # the lock cannot be pickled and the registry is loaded again on first
+        # use, so parsers can be sent to worker processes
+        state = self.__dict__.copy()
+        del state["_registry_lock"]
+        state["_named_tables"] = state["_intern_table"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._registry_lock = threading.Lock()
+
+    @property
+    def named_tables(self) -> frozenset:
+        # loaded on first use, so importing the module stays cheap
+        if self._named_tables is None:
+            with self._registry_lock:
+                if self._named_tables is None:
+                    self._named_tables = self.fill_named_tables() | self._registered
+        return self._named_tables
+
+    def register_named_tables(self, names):
+        """Add constructor IDs, e.g. of plugin fuses, to the loaded registry.
+
+        The set is replaced rather than changed in place, so encoders running
+        in other threads keep a consistent view.
+        """
+        names = frozenset(names)
+        with self._registry_lock:
+            self._registered |= names
+            if self._named_tables is not None:
+                self._named_tables |= names
+            self._intern_table = None
+
+    @property
+    def intern_table(self) -> dict:
+        """Strings every decode with `intern` starts from: the registry IDs
+        and `COMMON_KEYS`, mapped to themselves."""
+        table = self._intern_table
+        if table is None:
+            names = self.named_tables.union(COMMON_KEYS)
+            table = self._intern_table = {name: sys.intern(name) for name in names}
+        return table
+
+    def registry_path(self) -> Path:
+        """The explicit `registry` path, then $FLPP_REGISTRY, then the bundled list."""
+        return Path(self.registry or os.environ.get(REGISTRY_ENV) or REGISTRY_PATH)
+
+    def fill_named_tables(self):
+        return load_registry(self.registry_path())
+
+    @staticmethod
+    def table_object_keys(table_object):
+        return [
+            key for key in table_object if isinstance(key, (str, float, bool, tuple))
+        ]
+
+    def _empty_keys_to_list(self, table_object: dict):
+        # positional keys come from the parser as 0, 1, 2...
+        if all(key == index for index, key in enumerate(table_object)):
+            return list(table_object.values())
+        empty_keys_values = []
+        for key in table_object:
+            empty_keys_values.insert(key, table_object[key])
+        return empty_keys_values
+
+    def finish_table(self, output: dict):
+        # fix Loader clip parsing
+        if not self.nodes and isinstance(output.get(1), str) and output[1] == "Clip":
+            output = {0: "Clip", 1: output[0]}
+        elif len(self.table_object_keys(output)) == 0:
+            output = self._empty_keys_to_list(output)
+            if self.arrays and all(type(x) in (int, float) for x in output):
+                output = self.numeric_array(array("d", output))
+        return output
+
+    def numeric_array(self, values: array):
+        """Convert an `array("d")` of a numeric table to the `arrays` type."""
+        if self.arrays == "numpy":
+            return numpy.frombuffer(values)
+        return values
+
+    def load(self, path, cache_dir=None, cache_size=DEFAULT_CACHE_SIZE):
+        """Read and decode a Fusion file, without its header like `Composition`.
+
+        With `cache_dir`, decoded trees are kept in that directory, keyed by
+        the hash of the file contents and the decode options, and up to
+        `cache_size` bytes of the least recently used ones are kept. A
+        `DecodeCache` can be passed instead to share it and its statistics
+        between calls.
+        """
+        path = Path(path)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                cache = cache_dir
+                if cache is not None:
+                    if not isinstance(cache, DecodeCache):
+                        cache = DecodeCache(cache_dir, cache_size)
+                    key = self.cache_key(data, path.suffix)
+                    found, value = cache.get(key)
+                    if found:
+                        return value
+                value = self.decode(data)
+        if cache is not None:
+            cache.put(key, value)
+        return value
+
+    def cache_key(self, data, extension: str) -> str:
+        options = (CACHE_VERSION, self.engine, self.nodes, self.arrays, extension)
+        digest = hashlib.sha1(repr(options).encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def decode(self, text, select=None, lazy=False):
+        """Decode the Lua data in `text`.
+
+        With `select`, a list of key path patterns such as
+        "Tools.*.Inputs.Filename", only the matching branches are built and
+        every other table is skipped. Segments are matched with `fnmatch`
+        against the keys as they are parsed, so positional entries are better
+        matched with "*". Tables leading to a selected branch keep only the
+        selected keys and are not turned into lists.
+
+        `text` may also be UTF-8 `bytes`, a `memoryview` or an `mmap`, which
+        the regex engine parses without decoding it as a whole. A header like
+        `Composition` in front of the root table is skipped.
+
+        With `lazy`, tables are returned as read-only `LazyTable` mappings
+        and `LazyList` sequences, see `main.lazy`. Only the root table is
+        parsed, nested tables are stepped over by brace matching and decoded
+        the first time they are accessed.
+        """
+        if not text or not isinstance(text, (str,) + BYTES_TYPES):
+            return
+        if lazy:
+            if select is not None:
+                raise ValueError("select cannot be combined with lazy")
+            # the lazy module builds on this one
+            from .lazy import decode_lazy
+
+            return decode_lazy(self, text)
+        options = {"named_tables": self.nodes, "arrays": bool(self.arrays)}
+        if select is not None:
+            patterns = compile_paths(select)
+            skip = lambda path: match_path(patterns, path) == UNSELECTED
+            events = self.iterparse(text, skip=skip, **options)
+            if self.intern:
+                events = self.interned(events)
+            return self.build_selected(events, patterns)
+        if self.engine == "regex":
+            return self.decode_stream(text)
+        if not isinstance(text, str):
+            text = bytes(text).decode("utf-8")
+        header = HEADER.match(text)
+        if header:
+            text = text[header.end() :]
+        return CharReader(text, self.finish_table).item()
+
+    def decode_stream(self, fp, chunk_size=READ_CHUNK_SIZE):
+        """Decode the Lua data of the text file object `fp`, which the regex
+        engine reads `chunk_size` characters at a time. Strings and bytes are
+        accepted too, like by `iterparse`."""
+        if self.engine != "regex":
+            return self.decode(fp.read())
+        events = self.iterparse(
+            fp, chunk_size, named_tables=self.nodes, arrays=bool(self.arrays)
+        )
+        if self.intern:
+            events = self.interned(events)
+        return self.build(events)
+
+    def reader(self, source, chunk_size=READ_CHUNK_SIZE) -> Reader:
+        """The lexer `iterparse` reads `source` with."""
+        if isinstance(source, BYTES_TYPES):
+            return ByteReader(source)
+        return Reader(source, chunk_size)
+
+    def iterparse(
+        self,
+        source,
+        chunk_size=READ_CHUNK_SIZE,
+        skip=None,
+        named_tables=False,
+        arrays=False,
+        spans=False,
+        lazy=False,
+        offset=0,
+    ):
+        """Yield `(event, value)` pairs while parsing `source`.
+
+        `source` is a string or a text file object, which is read `chunk_size`
+        characters at a time. Events are "start_table", "key", "value" and
+        "end_table"; only "key" and "value" carry a value, and "end_table"
+        carries True for a table with nothing between its braces, like `{}`,
+        which `decode` keeps as an empty dict rather than a list. Keys of
+        positional values are the same integer indexes `decode` puts in the
+        tables.
+
+        `skip` is called with the key path of every nested table, tables it
+        returns True for are stepped over by brace matching without any events.
+
+        With `named_tables`, a constructor like `Loader {` yields a
+        ("named_table", "Loader") event right before its "start_table", under
+        the key of the constructor, instead of a value followed by a table.
+
+        With `arrays`, tables of decimal numbers only, like `{ 1001, 0.5 }`,
+        are scanned at once and yielded as a single value, see `numeric_array`.
+
+        With `spans`, every "value" and "end_table" event is followed by a
+        ("span", (start, end)) event with the source offsets of the value or
+        table, from the constructor name for named tables.
+
+        With `lazy`, only the first table is parsed: tables inside it are
+        stepped over by brace matching and yielded as a ("table", (start,
+        end)) event after their "key" and "named_table" events, where `start`
+        is the offset of their opening brace. Parsing begins at `offset`.
+        """
+        reader = self.reader(source, chunk_size)
+        if offset:
+            reader.seek(offset)
+        # stack of [next positional index, pending key, key in parent,
+        # start of pending key, start of table] for each open table
+        stack = []
+        key = start = None
+
+        def skipped(key, name=None):
+            """Step over the table at the cursor if it is not to be parsed and
+            return the events yielded in its place, None otherwise."""
+            if lazy:
+                if name is None and arrays:
+                    numbers = reader.numeric_table()
+                    if numbers:
+                        return (("key", key), ("value", self.numeric_array(numbers)))
+                table_start = reader.tell()
+                reader.skip_table()
+                table = ("table", (table_start, reader.tell()))
+                if name is None:
+                    return (("key", key), table)
+                return (("key", key), ("named_table", name), table)
+            if skip is None:
+                return None
+            if not skip(tuple(frame[2] for frame in stack[1:]) + (key,)):
+                return None
+            reader.skip_table()
+            return ()
+
+        reader.white()
+        value_start = reader.tell()
+        value = reader.item()
+        if isinstance(value, str):
+            reader.white()
+            if reader.ch == "{":
+                # a header like `Composition` in front of the root table
+                value = TABLE
+        if value is not TABLE:
+            yield "value", value
+            if spans:
+                yield "span", (value_start, reader.tell())
+            return
+        while True:
+            if spans and start is None:
+                start = reader.tell()
+            yield "start_table", None
+            reader.next_chr()
+            reader.white()
+            if reader.ch == "}":
+                reader.next_chr()
+                yield "end_table", True
+                if spans:
+                    yield "span", (start, reader.tell())
+            else:
+                stack.append([0, None, key, None, start])
+            start = None
+            # parse until a new table opens or the outermost one is closed
+            while stack:
+                frame = stack[-1]
+                reader.white()
+                ch = reader.ch
+                if ch is None:
+                    raise ParseError(ERRORS["unexp_end_table"])
+                if ch == "{":
+                    key = frame[0]
+                    frame[0] += 1
+                    stepped = skipped(key)
+                    if stepped is not None:
+                        yield from stepped
+                        continue
+                    yield "key", key
+                    value_start = spans and reader.tell()
+                    numbers = arrays and reader.numeric_table()
+                    if numbers:
+                        yield "value", self.numeric_array(numbers)
+                        if spans:
+                            yield "span", (value_start, reader.tell())
+                        continue
+                    break
+                elif ch == "}":
+                    if frame[1] is not None:  # see last zero test
+                        yield "key", frame[0]
+                        yield "value", frame[1]
+                        if spans:
+                            yield "span", frame[3]
+                    reader.next_chr()
+                    stack.pop()
+                    yield "end_table", None
+                    if spans:
+                        yield "span", (frame[4], reader.tell())
+                elif ch == ",":
+                    reader.next_chr()
+                else:
+                    value_start = spans and reader.tell()
+                    frame[1] = reader.item()
+                    frame[3] = spans and (value_start, reader.tell())
+                    if reader.ch == "]":
+                        reader.next_chr()
+                    reader.white()
+                    ch = reader.ch
+                    if ch not in ("=", ","):
+                        if ch == "{" and named_tables and isinstance(frame[1], str):
+                            # positional constructor, like Clip {
+                            key = frame[0]
+                            name = frame[1]
+                            frame[0] += 1
+                            frame[1] = None
+                            stepped = skipped(key, name)
+                            if stepped is not None:
+                                yield from stepped
+                                continue
+                            yield "key", key
+                            yield "named_table", name
+                            start = frame[3] and frame[3][0]
+                            break
+                        continue
+                    reader.next_chr()
+                    reader.white()
+                    if ch == "=":
+                        key = frame[1]
+                        value_start = spans and reader.tell()
+                        value = reader.item()
+                        value_span = spans and (value_start, reader.tell())
+                    else:
+                        key = frame[0]
+                        value = frame[1]
+                        value_span = frame[3]
+                    frame[0] += 1
+                    frame[1] = None
+                    if named_tables and isinstance(value, str):
+                        reader.white()
+                        if reader.ch == "{":
+                            stepped = skipped(key, value)
+                            if stepped is not None:
+                                yield from stepped
+                                continue
+                            yield "key", key
+                            yield "named_table", value
+                            start = value_span and value_span[0]
+                            break
+                    if value is not TABLE:
+                        yield "key", key
+                        yield "value", value
+                        if spans:
+                            yield "span", value_span
+                    else:
+                        stepped = skipped(key)
+                        if stepped is not None:
+                            yield from stepped
+                            continue
+                        yield "key", key
+                        numbers = arrays and reader.numeric_table()
+                        if numbers:
+                            yield "value", self.numeric_array(numbers)
+                            if spans:
+                                yield "span", (value_start, reader.tell())
+                            continue
+                        break
+            else:
+                return
+
+    def interned(self, events):
+        """Pass `iterparse` events through, with repeated strings replaced by
+        a single object.
+
+        Keys and constructor names are shared within the decoded tree and with
+        `intern_table`, which also catches the names of the default
+        representation, like "Input", that come as values. With
+        intern="values", every string value and number is shared as well.
+        """
+        seed = self.intern_table
+        strings = dict(seed)
+        values = self.intern == "values"
+        # ints and floats are kept apart, as 1 == 1.0
+        ints, floats = {}, {}
+        for event, value in events:
+            kind = type(value)
+            if kind is str:
+                if event != "value" or values:
+                    value = strings.setdefault(value, value)
+                else:
+                    value = seed.get(value, value)
+            elif values and event == "value":
+                if kind is int:
+                    value = ints.setdefault(value, value)
+                elif kind is float and value:
+                    # 0.0 == -0.0, zeros are left alone
+                    value = floats.setdefault(value, value)
+            yield event, value
+
+    def build(self, events, digests=None):
+        """Assemble the objects described by `iterparse` events.
+
+        With a `digests` dict, the Merkle hash of every table is computed as
+        it is closed and stored by `id`, see `table_digest`.
+        """
+        stack = []
+        key = name = None
+        for event, value in events:
+            if event == "key":
+                key = value
+            elif event == "value":
+                if not stack:
+                    return value
+                stack[-1][0][key] = value
+            elif event == "named_table":
+                name = value
+            elif event == "start_table":
+                stack.append(({}, key, name))
+                name = None
+            elif event == "end_table":
+                output, key, name = stack.pop()
+                # tables whose entries were all dropped, like `{nil}`, are lists
+                if output or not value:
+                    output = self.finish_table(output)
+                if name is not None:
+                    output = NamedTable(name, output)
+                    name = None
+                if digests is not None:
+                    table_digest(output, digests)
+                if not stack:
+                    return output
+                stack[-1][0][key] = output
+
+    def build_selected(self, events, patterns: list):
+        """Like `build`, but keep only the values selected by `patterns`."""
+        # stack of [output, key in parent, key path, fully selected, Clip table, name]
+        stack = []
+        key = name = None
+        for event, value in events:
+            if event == "key":
+                key = value
+            elif event == "value":
+                if not stack:
+                    return value if match_path(patterns, ()) == SELECTED else None
+                frame = stack[-1]
+                if frame[3] or match_path(patterns, frame[2] + (key,)) == SELECTED:
+                    frame[0][key] = value
+                elif key == 1 and value == "Clip":
+                    frame[4] = True
+            elif event == "named_table":
+                name = value
+            elif event == "start_table":
+                path = stack[-1][2] + (key,) if stack else ()
+                selected = bool(stack) and stack[-1][3]
+                selected = selected or match_path(patterns, path) == SELECTED
+                stack.append([{}, key, path, selected, False, name])
+                name = None
+            elif event == "end_table":
+                output, key, _, selected, clip, name = stack.pop()
+                if selected and (output or not value):
+                    output = self.finish_table(output)
+                elif clip:
+                    # keep the keys `finish_table` gives to Loader clips
+                    output = {1: output[0]} if 0 in output else {}
+                if name is not None and (selected or output):
+                    output = NamedTable(name, output)
+                name = None
+                if not stack:
+                    return output
+                if selected or output:
+                    stack[-1][0][key] = output
+
+    def spans(self, source, select=None) -> dict:
+        """Map the key path of every value and table in `source` to its
+        `(start, end)` offsets.
+
+        Paths are tuples of the keys `FLPP(nodes=True)` decodes, so named
+        tables are found under the key of their constructor. With `select`,
+        as in `decode`, other tables are skipped. Offsets of bytes sources
+        are byte offsets.
+        """
+        skip = None
+        if select is not None:
+            patterns = compile_paths(select)
+            skip = lambda path: match_path(patterns, path) == UNSELECTED
+        events = self.iterparse(source, skip=skip, named_tables=True, spans=True)
+        return dict(self._iterspans(events))
+
+    def _iterspans(self, events):
+        """Yield `(key path, span)` from `iterparse` events with spans."""
+        # key paths of the open tables
+        stack = []
+        key = path = None
+        for event, value in events:
+            if event == "key":
+                key = value
+            elif event == "value":
+                path = stack[-1] + (key,) if stack else ()
+            elif event == "start_table":
+                stack.append(stack[-1] + (key,) if stack else ())
+            elif event == "end_table":
+                path = stack.pop()
+            elif event == "span":
+                yield path, value
+
+    def patch(self, text: str, changes: dict) -> str:
+        """Replace values of `text` by key path, keeping the rest byte for byte.
+
+        `changes` maps key paths like "Tools.exr.Clips[0].Filename", or tuples
+        of keys, to new values; paths are the ones of `spans`. Only the tables
+        leading to the changes are parsed, every other one is skipped by brace
+        matching, and only the new values are encoded.
+        """
+        targets = {parse_key_path(path): value for path, value in changes.items()}
+        skip = lambda path: not any(target[: len(path)] == path for target in targets)
+        events = self.iterparse(text, skip=skip, named_tables=True, spans=True)
+        found = {
+            path: span for path, span in self._iterspans(events) if path in targets
+        }
+        missing = [path for path in targets if path not in found]
+        if missing:
+            raise KeyError(f"Key paths not found: {missing}")
+
+        pieces, end = [], 0
+        for path, (start, stop) in sorted(found.items(), key=lambda item: item[1]):
+            if start < end:
+                raise ValueError(f"Change of {path} overlaps another change")
+            pieces.append(text[end:start])
+            pieces.extend(self._iterencode(targets[path], len(path)))
+            end = stop
+        pieces.append(text[end:])
+        return "".join(pieces)
+
+    def hashed(self, source):
+        """Return `source` decoded, if it is Lua text, and the digests of its tables.
+
+        The regex engine hashes the tables while decoding.
+        """
+        if isinstance(source, (str,) + BYTES_TYPES) and self.engine == "regex":
+            digests = {}
+            options = {"named_tables": self.nodes, "arrays": bool(self.arrays)}
+            return self.build(self.iterparse(source, **options), digests), digests
+        if isinstance(source, (str,) + BYTES_TYPES):
+            source = self.decode(source)
+        return source, tree_digests(source)
+
+    def diff(self, a, b) -> list:
+        """List the `Change`s from `a` to `b`, Lua text or decoded data.
+
+        Tables with the same Merkle hash are skipped without being compared.
+        """
+        # the diff module builds on this one
+        from .diff import diff_trees
+
+        return diff_trees(*self.hashed(a), *self.hashed(b))
+
+    def merge(self, base, ours, theirs, header=None):
+        """Three-way merge of Lua texts or decoded data, returns the merged
+        Lua text and the list of `Conflict`s, which keep our side."""
+        from .diff import merge_trees
+
+        merged, conflicts = merge_trees(
+            self.hashed(base), self.hashed(ours), self.hashed(theirs)
+        )
+        return self.encode(merged, header), conflicts
+
+    def lua_to_json(self, src, dst, indent=4, chunk_size=READ_CHUNK_SIZE):
+        """Transcode Lua data into JSON without building the decoded tree.
+
+        Writes to the text file object `dst` what `json.dump(decode(text), dst,
+        indent=indent)` would, with the default representation. `src` is a
+        text or binary file object, or Lua data like `decode` takes. It is
+        read twice: first to tell lists from dicts and find `Clip` tables,
+        which only takes a byte per table, then to write the JSON token by
+        token.
+        """
+        if self.nodes or self.arrays:
+            raise ValueError("lua_to_json writes the default representation")
+        from .transcode import lua_to_json
+
+        lua_to_json(self, src, dst, indent, chunk_size)
+
+    def json_to_lua(self, src, dst, header=None, chunk_size=READ_CHUNK_SIZE):
+        """Transcode JSON into Lua without building the decoded tree.
+
+        Writes to `dst` what `dump(json.load(src), dst, header)` would, reading
+        the JSON text file object `src` `chunk_size` characters at a time.
+        Only lists short enough to be written on one line are held back.
+        """
+        from .transcode import json_to_lua
+
+        json_to_lua(self, src, dst, header, chunk_size)
+
+    def dump_binary(self, obj, fp):
+        """Write `obj` into the binary file object `fp` in the compact FLPP
+        binary format, which `load_binary` reads back with the same types."""
+        from .binary import dump_binary
+
+        dump_binary(obj, fp)
+
+    def load_binary(self, fp):
+        from .binary import load_binary
+
+        return load_binary(fp)
+
+    async def aload(self, path, offload=None):
+        """Decode a Fusion file without blocking the event loop.
+
+        The file is read in chunks and parsed in the executor of `offload`, an
+        `Offload` from `main.aio`, which also limits how many files are parsed
+        at once; by default threads of the loop's executor, up to one file per
+        CPU.
+        """
+        from .aio import DEFAULT_OFFLOAD
+
+        return await (offload or DEFAULT_OFFLOAD).load(self, path)
+
+    async def asave(self, obj, path, header=None, offload=None):
+        """Encode `obj` into the file at `path` without blocking the event loop.
+
+        `header` defaults to the one of the file extension, like "Composition"
+        for .comp files. The file is written in chunks next to `path` and
+        moved in place once complete.
+        """
+        from .aio import DEFAULT_OFFLOAD
+
+        await (offload or DEFAULT_OFFLOAD).save(self, obj, path, header)
+
+    def aiterdir(self, directory, pattern="*.comp", offload=None, **options):
+        """Asynchronously iterate over `(path, data)` of the files matching the
+        glob `pattern` in `directory`, decoded like `aload`, as they are done.
+
+        See `Offload.iterdir` for the `return_exceptions` option.
+        """
+        from .aio import DEFAULT_OFFLOAD
+
+        return (offload or DEFAULT_OFFLOAD).iterdir(self, directory, pattern, **options)
+
+    def encode(self, obj, header=None):
+        return "".join(self.iterencode(obj, header))
+
+    def iterencode(self, obj, header=None):
+        """Yield the Lua representation of `obj` piece by piece.
+
+        `header` is written in front of the top table, e.g. "Composition" for .comp files.
+        """
+        if header:
+            yield f"{header} "
+        yield from self._iterencode(obj, 0)
+
+    def dump(self, obj, fp, header=None, chunk_size=DUMP_CHUNK_SIZE):
+        """Encode `obj` into the file object `fp`, writing at most around
+        `chunk_size` characters at a time."""
+        chunk, size = [], 0
+        for piece in self.iterencode(obj, header):
+            chunk.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                fp.write("".join(chunk))
+                chunk, size = [], 0
+        if chunk:
+            fp.write("".join(chunk))
+
+    def _check_length(self, obj) -> bool:
+        return all(
+            isinstance(x, Number) or (isinstance(x, str) and len(x) < 10) for x in obj
+        )
+
+    def _build_keys(self, obj: dict):
+        return map(self._build_key, obj.keys())
+
+    @staticmethod
+    def _build_key(key):
+        if isinstance(key, int):
+            return key
+        if isinstance(key, str) and ":" in key or BRACKETED_KEY.search(key):
+            # parse bracketed keys, such as ["Gamut.SLogVersion"] or ["!Left"]
+            return f'["{key}"]'
+        return f"{key}"
+
+    def _build_content(self, obj):
+        """Yield `(key, value)` pairs of a table, `key` is None for positional values."""
+        if not isinstance(obj, dict):
+            for value in obj:
+                yield None, value
+            return
+        for key, value in zip(self._build_keys(obj), obj.values()):
+            try:
+                int(key)
+                # remove temporary numeric keys
+                yield None, value
+            except ValueError:
+                yield key, value
+
+    def _is_named_table(self, value, following) -> bool:
+        """Check if `value` is a constructor name, like ordered() or MultiView,
+        applied to the positional table that follows it."""
+        key, table = following
+        if key is not None:
+            return False
+        if not isinstance(table, (list, tuple, dict)) and not self._is_array(table):
+            return False
+        return isinstance(value, str) and value in self.named_tables
+
+    @staticmethod
+    def _is_array(obj) -> bool:
+        return isinstance(obj, array) or type(obj).__name__ == "ndarray"
+
+    def _array_text(self, obj) -> str:
+        """Write a numeric array in the compact layout of short lists, `{1,2}`."""
+        # Lua numbers are doubles, integral ones are written like the parsed ints
+        return "{%s}" % ",".join(
+            (
+                str(int(x))
+                if isinstance(x, float)
+                and x.is_integer()
+                and -MAX_EXACT_INT < x < MAX_EXACT_INT
+                else str(x)
+            )
+            for x in obj.tolist()
+        )
+
+    def _iterencode(self, obj, depth):
+        # [entries, next entry, depth, newline, tab, comma pending] of the
+        # open tables, the innermost last, so nesting is not limited by the
+        # Python stack
+        stack = []
+        while True:
+            if isinstance(obj, str):
+                yield f'"{obj}"'
+            elif isinstance(obj, bytes):
+                yield '"{}"'.format("".join(r"\x{:02x}".format(c) for c in obj))
+            elif isinstance(obj, bool):
+                yield str(obj).lower()
+            elif obj is None:
+                yield "nil"
+            elif isinstance(obj, Number):
+                yield str(obj)
+            elif isinstance(obj, NamedTable):
+                yield f"{obj.type} "
+                obj = obj.fields
+                continue
+            elif self._is_array(obj):
+                if getattr(obj, "ndim", 1) != 1:
+                    # rows of a multidimensional NumPy array
+                    obj = list(obj)
+                    continue
+                yield self._array_text(obj)
+            elif isinstance(obj, (list, tuple, dict)):
+                depth += 1
+                newline, tab = self.newline, self.tab
+                if len(obj) == 0 or (
+                    not isinstance(obj, dict) and self._check_length(obj)
+                ):
+                    newline = tab = ""
+                yield "{" + newline
+                contents = self._build_content(obj)
+                stack.append(
+                    [contents, next(contents, None), depth, newline, tab, False]
+                )
+
+            # find the next value to write, closing the finished tables
+            while stack:
+                frame = stack[-1]
+                contents, current, depth, newline, tab, comma = frame
+                if comma:
+                    yield "," + newline
+                    frame[5] = False
+                if current is None:
+                    stack.pop()
+                    yield f"{newline}{tab * (depth - 1)}" + "}"
+                    continue
+                following = frame[1] = next(contents, None)
+                key, value = current
+                indent = tab * depth
+                yield indent if key is None else f"{indent}{key} = "
+                if following and newline and self._is_named_table(value, following):
+                    # named tables are written without quotes and commas, e.g. Merge {
+                    yield value + newline
+                    continue
+                if isinstance(value, NamedTable):
+                    yield value.type + newline + indent
+                    value = value.fields
+                frame[5] = following is not None
+                obj = value
+                break
+            else:
+                return
+
+
 flpp = FLPP()
+decode = flpp.decode
+encode = flpp.encode
+register_named_tables = flpp.register_named_tables
 
-__all__ = ["flpp"]
+__all__ = ["flpp", "decode", "encode", "register_named_tables", "NamedTable"]
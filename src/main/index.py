@@ -0,0 +1,307 @@
+import os
+import hashlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .flpp import FLPP, NamedTable
+
+INDEX_EXTENSIONS = (".comp", ".setting")
+INDEX_FILE = ".flpp-index.sqlite"
+# bump when the tables or what is extracted change, older indexes are rebuilt
+INDEX_VERSION = 1
+READ, WRITE = "read", "write"
+SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL,
+    size INTEGER,
+    hash TEXT,
+    error TEXT
+);
+CREATE TABLE tools (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    parent TEXT
+);
+CREATE TABLE media (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    tool TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    mode TEXT NOT NULL
+);
+CREATE INDEX tools_file ON tools (file_id);
+CREATE INDEX tools_type ON tools (type);
+CREATE INDEX media_file ON media (file_id);
+CREATE INDEX media_filename ON media (filename);
+"""
+# only the tools are decoded, everything else is skipped by brace matching
+parser = FLPP(nodes=True)
+
+
+def fields(table) -> dict:
+    if isinstance(table, NamedTable):
+        table = table.fields
+    return table if isinstance(table, dict) else {}
+
+
+def clip_filename(clip):
+    if isinstance(clip, NamedTable) and clip.type == "Clip":
+        filename = fields(clip).get("Filename")
+        if isinstance(filename, str) and filename:
+            return filename
+    return None
+
+
+def extract(tree) -> tuple:
+    """List the `(name, type, parent)` of the tools of a decoded comp or
+    setting, and the `(tool, filename, mode)` of the media they read and write.
+
+    Tools inside groups and macros have the name of the group as `parent`.
+    Loader clips are read, clips in inputs like the one of a Saver are
+    written by savers and read by any other tool.
+    """
+    tools, media = [], []
+    stack = [(fields(tree).get("Tools"), None)]
+    while stack:
+        table, parent = stack.pop()
+        for name, tool in fields(table).items():
+            if not isinstance(tool, NamedTable):
+                continue
+            tools.append((str(name), tool.type, parent))
+            body = fields(tool)
+            clips = body.get("Clips")
+            if isinstance(clips, list):
+                for clip in clips:
+                    filename = clip_filename(clip)
+                    if filename:
+                        media.append((str(name), filename, READ))
+            mode = WRITE if tool.type == "Saver" else READ
+            for value in fields(body.get("Inputs")).values():
+                filename = clip_filename(fields(value).get("Value"))
+                if filename:
+                    media.append((str(name), filename, mode))
+            if "Tools" in body:
+                stack.append((body["Tools"], str(name)))
+    return tools, media
+
+
+def file_hash(data: bytes) -> str:
+    """Hash of file contents, as stored by `flpp index` and `flpp convert`."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def index_file(task):
+    """Decode one file and extract its tools and media.
+
+    `task` is `(path, known_hash)`. Files with the known hash are not decoded.
+    Errors are returned in the result instead of raised, like in `flpp convert`.
+    """
+    path, known_hash = task
+    result = {"path": path, "error": None, "tools": [], "media": []}
+    try:
+        stat = os.stat(path)
+        result.update(mtime=stat.st_mtime, size=stat.st_size)
+        with open(path, "rb") as f:
+            data = f.read()
+        result["hash"] = file_hash(data)
+        if result["hash"] == known_hash:
+            result["status"] = "unchanged"
+            return result
+        result["tools"], result["media"] = extract(
+            parser.decode(data, select=["Tools"])
+        )
+        result["status"] = "indexed"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def collect(paths) -> list:
+    """Files to index in `paths`, which are files or directories."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            candidates = sorted(path.rglob("*"))
+        else:
+            candidates = [path]
+        for file in candidates:
+            if file.suffix in INDEX_EXTENSIONS and file.is_file():
+                files.append(str(file.resolve()))
+    return files
+
+
+class LibraryIndex:
+    """SQLite index of the tools and media of a library of comps.
+
+    `update` decodes only files whose size, modification time and then
+    content hash changed since they were indexed; queries take glob
+    patterns, e.g. "/shows/*/plate.*.exr" or "Fuse.*".
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = str(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_VERSION:
+            with self.db:
+                for table in ("media", "tools", "files"):
+                    self.db.execute(f"DROP TABLE IF EXISTS {table}")
+                self.db.executescript(SCHEMA)
+                self.db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, paths, jobs=1, chunksize=16, prune=True) -> dict:
+        """Index the comps and settings in `paths`, files or directories.
+
+        With `prune`, indexed files inside the directories of `paths` that no
+        longer exist are removed. Returns the counts of "indexed",
+        "unchanged", "failed" and "removed" files.
+        """
+        known = {
+            row[0]: row[1:]
+            for row in self.db.execute("SELECT path, mtime, size, hash FROM files")
+        }
+        counts = {"indexed": 0, "unchanged": 0, "failed": 0, "removed": 0}
+        files = collect(paths)
+        tasks = []
+        for path in files:
+            entry = known.get(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # gone since `collect`, `index_file` records the error
+                tasks.append((path, None))
+                continue
+            if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+                counts["unchanged"] += 1
+                continue
+            tasks.append((path, entry[2] if entry else None))
+
+        if jobs == 1:
+            results = map(index_file, tasks)
+        else:
+            pool = ProcessPoolExecutor(max_workers=jobs)
+            results = pool.map(index_file, tasks, chunksize=chunksize)
+        try:
+            with self.db:
+                for result in results:
+                    counts[result["status"]] += 1
+                    self.store(result)
+                if prune:
+                    counts["removed"] = self.prune(paths, set(files))
+        finally:
+            if jobs != 1:
+                pool.shutdown()
+        return counts
+
+    def store(self, result: dict):
+        db = self.db
+        if result["status"] == "unchanged":
+            db.execute(
+                "UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+                (result["mtime"], result["size"], result["path"]),
+            )
+            return
+        db.execute("DELETE FROM files WHERE path = ?", (result["path"],))
+        file_id = db.execute(
+            "INSERT INTO files (path, mtime, size, hash, error) VALUES (?, ?, ?, ?, ?)",
+            (
+                result["path"],
+                result.get("mtime"),
+                result.get("size"),
+                result.get("hash"),
+                result["error"],
+            ),
+        ).lastrowid
+        db.executemany(
+            "INSERT INTO tools (file_id, name, type, parent) VALUES (?, ?, ?, ?)",
+            [(file_id, *tool) for tool in result["tools"]],
+        )
+        db.executemany(
+            "INSERT INTO media (file_id, tool, filename, mode) VALUES (?, ?, ?, ?)",
+            [(file_id, *media) for media in result["media"]],
+        )
+
+    def prune(self, paths, present: set) -> int:
+        removed = 0
+        for directory in map(Path, paths):
+            if not directory.is_dir():
+                continue
+            prefix = str(directory.resolve()).rstrip(os.sep) + os.sep
+            rows = self.db.execute(
+                "SELECT path FROM files WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).fetchall()
+            for (path,) in rows:
+                if path not in present:
+                    self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                    removed += 1
+        return removed
+
+    def files(self) -> list:
+        return [
+            row[0] for row in self.db.execute("SELECT path FROM files ORDER BY path")
+        ]
+
+    def errors(self) -> dict:
+        return dict(
+            self.db.execute(
+                "SELECT path, error FROM files WHERE error IS NOT NULL ORDER BY path"
+            )
+        )
+
+    def reading(self, pattern: str) -> list:
+        """Files with a tool reading a media file matching `pattern`."""
+        return self.media_files(pattern, READ)
+
+    def writing(self, pattern: str) -> list:
+        """Files with a Saver writing a media file matching `pattern`."""
+        return self.media_files(pattern, WRITE)
+
+    def media_files(self, pattern: str, mode: str) -> list:
+        rows = self.db.execute(
+            "SELECT DISTINCT files.path FROM media JOIN files ON files.id = file_id "
+            "WHERE media.filename GLOB ? AND media.mode = ? ORDER BY files.path",
+            (pattern, mode),
+        )
+        return [row[0] for row in rows]
+
+    def using(self, tool_type: str) -> list:
+        """Files with a tool, fuse or macro of a type matching `tool_type`."""
+        rows = self.db.execute(
+            "SELECT DISTINCT files.path FROM tools JOIN files ON files.id = file_id "
+            "WHERE tools.type GLOB ? ORDER BY files.path",
+            (tool_type,),
+        )
+        return [row[0] for row in rows]
+
+    def tools(self, path) -> list:
+        """`(name, type, parent)` of the tools of an indexed file."""
+        rows = self.db.execute(
+            "SELECT tools.name, tools.type, tools.parent FROM tools "
+            "JOIN files ON files.id = file_id WHERE files.path = ? ORDER BY tools.rowid",
+            (str(Path(path).resolve()),),
+        )
+        return rows.fetchall()
+
+    def media(self, path) -> list:
+        """`(tool, filename, mode)` of the media of an indexed file."""
+        rows = self.db.execute(
+            "SELECT media.tool, media.filename, media.mode FROM media "
+            "JOIN files ON files.id = file_id WHERE files.path = ? ORDER BY media.rowid",
+            (str(Path(path).resolve()),),
+        )
+        return rows.fetchall()
@@ -0,0 +1,141 @@
+from collections.abc import Mapping, Sequence
+
+from .flpp import NamedTable
+
+
+class TableSpan:
+    """A nested table not decoded yet: its opening brace in the source and the
+    name of its constructor, if any."""
+
+    __slots__ = ("start", "name")
+
+    def __init__(self, start: int, name=None):
+        self.start = start
+        self.name = name
+
+
+def decode_lazy(parser, source, offset=0):
+    """Decode the table at `offset` of `source` one level deep.
+
+    Nested tables are left as `TableSpan`s in the returned `LazyTable` or
+    `LazyList`, values of other types are returned as they are.
+    """
+    output = {}
+    key = name = None
+    empty = False
+    events = parser.iterparse(
+        source,
+        named_tables=parser.nodes,
+        arrays=bool(parser.arrays),
+        lazy=True,
+        offset=offset,
+    )
+    if parser.intern:
+        events = parser.interned(events)
+    for event, value in events:
+        if event == "key":
+            key = value
+        elif event == "value":
+            if key is None:
+                return value
+            output[key] = value
+        elif event == "named_table":
+            name = value
+        elif event == "table":
+            output[key] = TableSpan(value[0], name)
+            name = None
+        elif event == "end_table":
+            empty = value
+    if empty:
+        return {}
+    output = parser.finish_table(output)
+    if isinstance(output, dict):
+        return LazyTable(parser, source, output)
+    if isinstance(output, list):
+        return LazyList(parser, source, output)
+    return output
+
+
+class LazyTable(Mapping):
+    """Read-only mapping of a decoded table whose nested tables are decoded
+    the first time they are looked up, then kept.
+
+    Proxies hold a reference to the whole source. A fully accessed proxy
+    compares equal to the table `FLPP.decode` builds; `resolve` turns it
+    into plain dicts and lists.
+    """
+
+    __slots__ = ("parser", "source", "_items")
+
+    def __init__(self, parser, source, items):
+        self.parser = parser
+        self.source = source
+        self._items = items
+
+    def __getitem__(self, key):
+        value = self._items[key]
+        if type(value) is TableSpan:
+            value = self._items[key] = expand(self.parser, self.source, value)
+        return value
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __repr__(self):
+        return f"<LazyTable of {len(self)} keys>"
+
+
+class LazyList(Sequence):
+    """Read-only sequence counterpart of `LazyTable`, for positional tables."""
+
+    __slots__ = ("parser", "source", "_items")
+
+    def __init__(self, parser, source, items):
+        self.parser = parser
+        self.source = source
+        self._items = items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = self._items[index]
+        if type(value) is TableSpan:
+            value = self._items[index] = expand(self.parser, self.source, value)
+        return value
+
+    def __len__(self):
+        return len(self._items)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, LazyList)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<LazyList of {len(self)} items>"
+
+
+def expand(parser, source, span: TableSpan):
+    value = decode_lazy(parser, source, span.start)
+    if span.name is not None:
+        return NamedTable(span.name, value)
+    return value
+
+
+def resolve(obj):
+    """Decode every pending table of `obj` and return plain dicts and lists."""
+    if isinstance(obj, Mapping):
+        return {key: resolve(value) for key, value in obj.items()}
+    if isinstance(obj, LazyList):
+        return [resolve(value) for value in obj]
+    if isinstance(obj, NamedTable):
+        return NamedTable(obj.type, resolve(obj.fields))
+    return obj
@@ -0,0 +1,301 @@
+import heapq
+from collections import Counter
+from time import perf_counter
+
+from .flpp import (
+    FLPP,
+    BYTES_TYPES,
+    READ_CHUNK_SIZE,
+    ByteReader,
+    Reader,
+    format_key_path,
+)
+
+# subtrees kept by `Stats.largest`
+LARGEST = 10
+
+
+class Stats:
+    """Timers and counters collected by `ProfiledFLPP`.
+
+    `phases` holds the seconds spent in whole decode and encode calls,
+    `reader` and `encoder` the seconds spent in their parts, and `tokens`
+    the number of tokens read of each kind. Parts overlap where one calls
+    another, e.g. strings are also read while skipping tables.
+    """
+
+    def __init__(self, largest=LARGEST):
+        self.phases = Counter()
+        self.calls = Counter()
+        self.sizes = Counter()
+        self.reader = Counter()
+        self.encoder = Counter()
+        self.tokens = Counter()
+        self.max_depth = 0
+        self.keep = largest
+        # min-heap of (size, key path) of the largest tables
+        self.largest = []
+
+    def count(self, kind: str, start: float):
+        """Add a token of `kind`, read since the `perf_counter` value `start`."""
+        self.reader[kind] += perf_counter() - start
+        self.tokens[kind] += 1
+
+    def phase(self, name: str, seconds: float, size: int):
+        self.phases[name] += seconds
+        self.calls[name] += 1
+        self.sizes[name] += size
+
+    def table(self, path: str, size: int):
+        if len(self.largest) < self.keep:
+            heapq.heappush(self.largest, (size, path))
+        elif size > self.largest[0][0]:
+            heapq.heapreplace(self.largest, (size, path))
+
+    def rate(self, name: str) -> float:
+        """Characters, or bytes of bytes sources, per second of a phase."""
+        seconds = self.phases[name]
+        return self.sizes[name] / seconds if seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": dict(self.phases),
+            "calls": dict(self.calls),
+            "sizes": dict(self.sizes),
+            "rates": {name: self.rate(name) for name in self.phases},
+            "reader": dict(self.reader),
+            "encoder": dict(self.encoder),
+            "tokens": dict(self.tokens),
+            "max_depth": self.max_depth,
+            "largest": [
+                {"path": path, "size": size}
+                for size, path in sorted(self.largest, reverse=True)
+            ],
+        }
+
+    def update(self, report: dict):
+        """Add the counters of a `to_dict` report, e.g. from another process."""
+        for name in ("phases", "calls", "sizes", "reader", "encoder", "tokens"):
+            getattr(self, name).update(report.get(name, {}))
+        self.max_depth = max(self.max_depth, report.get("max_depth", 0))
+        for entry in report.get("largest", ()):
+            self.table(entry["path"], entry["size"])
+
+
+class TimedReader:
+    """Mixin timing and counting the tokens a `Reader` reads into `stats`."""
+
+    stats = None
+
+    def string(self, end=None):
+        start = perf_counter()
+        value = super().string(end)
+        self.stats.count("strings", start)
+        return value
+
+    def number(self):
+        start = perf_counter()
+        value = super().number()
+        self.stats.count("numbers", start)
+        return value
+
+    def word(self):
+        start = perf_counter()
+        value = super().word()
+        self.stats.count("words", start)
+        return value
+
+    def numeric_table(self):
+        start = perf_counter()
+        value = super().numeric_table()
+        if value is not None:
+            self.stats.count("numeric tables", start)
+        return value
+
+    def skip_table(self):
+        start = perf_counter()
+        super().skip_table()
+        self.stats.count("skipped tables", start)
+
+    def white(self):
+        ch = self.ch
+        if ch is None or not (ch == "-" or ch.isspace()):
+            return
+        start, offset, pos = perf_counter(), self.offset, self.at - 1
+        super().white()
+        self.stats.reader["whitespace"] += perf_counter() - start
+        # the run may have moved in the buffer when the next chunk was read
+        pos -= self.offset - offset
+        if pos >= 0:
+            run = self.text[pos : self.tell() - self.offset]
+            if isinstance(run, memoryview):
+                run = run.tobytes()
+            comments = run.count("--" if isinstance(run, str) else b"--")
+            if comments:
+                self.stats.tokens["comments"] += comments
+
+
+class TimedStrReader(TimedReader, Reader):
+    pass
+
+
+class TimedByteReader(TimedReader, ByteReader):
+    pass
+
+
+def timed(iterator, timers: Counter, name: str):
+    """Yield from `iterator`, adding the time spent in it to `timers[name]`."""
+    while True:
+        start = perf_counter()
+        try:
+            value = next(iterator)
+        except StopIteration:
+            timers[name] += perf_counter() - start
+            return
+        timers[name] += perf_counter() - start
+        yield value
+
+
+class ProfiledFLPP(FLPP):
+    """`FLPP` collecting `Stats` about everything it decodes and encodes.
+
+    After each decode and encode, `on_phase(name, seconds, size)` is called,
+    and `on_table(path, size)` for every table the regex engine reads, with
+    its key path and its size in the source. The `largest` tables are kept
+    in `stats`.
+
+    `FLPP` itself is not instrumented at all, so profiling costs nothing
+    unless this class is used. Unlike `FLPP`, instances count into one
+    `stats` and should not be shared between threads.
+    """
+
+    def __init__(self, *args, on_phase=None, on_table=None, largest=LARGEST, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = Stats(largest)
+        self.on_phase = on_phase
+        self.on_table = on_table
+        # set while a decode is timed, `decode` goes through `decode_stream`
+        self._decoding = False
+        # end of the last root table read, the size of streamed sources
+        self._end = 0
+
+    def phase(self, name: str, seconds: float, size: int):
+        self.stats.phase(name, seconds, size)
+        if self.on_phase is not None:
+            self.on_phase(name, seconds, size)
+
+    def reader(self, source, chunk_size=READ_CHUNK_SIZE) -> Reader:
+        if isinstance(source, BYTES_TYPES):
+            reader = TimedByteReader(source)
+        else:
+            reader = TimedStrReader(source, chunk_size)
+        reader.stats = self.stats
+        return reader
+
+    def decode(self, text, select=None, lazy=False):
+        if self._decoding:
+            return super().decode(text, select, lazy)
+        self._decoding = True
+        start = perf_counter()
+        try:
+            value = super().decode(text, select, lazy)
+        finally:
+            self._decoding = False
+        self.phase("decode", perf_counter() - start, len(text) if text else 0)
+        return value
+
+    def decode_stream(self, fp, chunk_size=READ_CHUNK_SIZE):
+        if self._decoding:
+            return super().decode_stream(fp, chunk_size)
+        self._decoding = True
+        self._end = 0
+        start = perf_counter()
+        try:
+            value = super().decode_stream(fp, chunk_size)
+        finally:
+            self._decoding = False
+        size = len(fp) if isinstance(fp, (str,) + BYTES_TYPES) else self._end
+        self.phase("decode", perf_counter() - start, size)
+        return value
+
+    def iterparse(
+        self,
+        source,
+        chunk_size=READ_CHUNK_SIZE,
+        skip=None,
+        named_tables=False,
+        arrays=False,
+        spans=False,
+        lazy=False,
+        offset=0,
+    ):
+        events = super().iterparse(
+            source,
+            chunk_size,
+            skip,
+            named_tables,
+            arrays,
+            spans=True,
+            lazy=lazy,
+            offset=offset,
+        )
+        return self._profiled(events, spans)
+
+    def _profiled(self, events, spans: bool):
+        """Count tables, depth and sizes of tables from events with spans."""
+        stats = self.stats
+        # key paths of the open tables
+        stack = []
+        key = closed = empty = None
+        for event, value in events:
+            if event == "key":
+                key = value
+            elif event == "start_table":
+                stack.append(stack[-1] + (key,) if stack else ())
+                stats.tokens["tables"] += 1
+                stats.max_depth = max(stats.max_depth, len(stack))
+            elif event == "end_table":
+                # held back until its span, `build` stops at the root table
+                closed = format_key_path(stack.pop())
+                empty = value
+                continue
+            elif event == "span" and closed is not None:
+                size = value[1] - value[0]
+                stats.table(closed, size)
+                if not stack:
+                    self._end = value[1]
+                if self.on_table is not None:
+                    self.on_table(closed, size)
+                closed = None
+                yield "end_table", empty
+            if spans or event != "span":
+                yield event, value
+
+    def iterencode(self, obj, header=None):
+        # only the time spent encoding, not in the consumer of the pieces
+        timers, size = Counter(), 0
+        for piece in timed(super().iterencode(obj, header), timers, "encode"):
+            size += len(piece)
+            yield piece
+        self.phase("encode", timers["encode"], size)
+
+    def _check_length(self, obj) -> bool:
+        start = perf_counter()
+        result = super()._check_length(obj)
+        self.stats.encoder["short lists"] += perf_counter() - start
+        return result
+
+    def _build_keys(self, obj: dict):
+        return timed(super()._build_keys(obj), self.stats.encoder, "keys")
+
+    def _is_named_table(self, value, following) -> bool:
+        start = perf_counter()
+        result = super()._is_named_table(value, following)
+        self.stats.encoder["named tables"] += perf_counter() - start
+        return result
+
+    def _array_text(self, obj) -> str:
+        start = perf_counter()
+        text = super()._array_text(obj)
+        self.stats.encoder["arrays"] += perf_counter() - start
+        return text
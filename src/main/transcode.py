@@ -0,0 +1,471 @@
+import io
+import json
+import math
+import mmap
+import os
+import re
+from json.decoder import scanstring
+from json.encoder import encode_basestring_ascii
+from json.scanner import NUMBER_RE
+from numbers import Number
+
+from .flpp import BYTES_TYPES, DUMP_CHUNK_SIZE, READ_CHUNK_SIZE, ParseError
+
+# how the second pass of `lua_to_json` writes each table, in the order they start
+DICT, LIST, CLIP, BUILD = range(4)
+# placeholder for a table value in `iterlua`
+TABLE = object()
+# separators are skipped like whitespace
+JSON_SKIP = re.compile(r"[ \t\n\r,:]*")
+# a bracket, a string without escapes or a number
+JSON_TOKEN = re.compile(
+    r'[ \t\n\r,:]*(?:([\[\]{}])|"([^"\\]*)"|(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?)'
+)
+JSON_CONSTANTS = {
+    "true": True,
+    "false": False,
+    "null": None,
+    "NaN": math.nan,
+    "Infinity": math.inf,
+    "-Infinity": -math.inf,
+}
+
+
+def write_chunks(fp, pieces, chunk_size=DUMP_CHUNK_SIZE):
+    """Write `pieces` into `fp`, joined into chunks of around `chunk_size`."""
+    chunk, size = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            fp.write("".join(chunk))
+            chunk, size = [], 0
+    if chunk:
+        fp.write("".join(chunk))
+
+
+def table_kinds(events) -> bytearray:
+    """First pass of `lua_to_json`: what `FLPP.build` makes of each table.
+
+    Tables with entries `iterjson` cannot write in order, like repeated keys
+    or keys other than names and positions, are marked `BUILD` and built as
+    a whole in the second pass.
+    """
+    kinds = bytearray()
+    # stack of [index in kinds, keyed, keys, has key 0, Clip at key 1, build]
+    stack = []
+    key = None
+    for event, value in events:
+        if event == "key":
+            key = value
+        elif event == "value" or event == "start_table":
+            if stack:
+                frame = stack[-1]
+                if type(key) is int:
+                    if key == 0:
+                        frame[3] = True
+                    elif key == 1 and event == "value" and value == "Clip":
+                        frame[4] = True
+                elif type(key) is str and key not in frame[2]:
+                    frame[1] = True
+                    frame[2].add(key)
+                else:
+                    frame[5] = True
+            if event == "start_table":
+                stack.append([len(kinds), False, set(), False, False, False])
+                kinds.append(DICT)
+        elif event == "end_table":
+            index, keyed, _, first, clip, build = stack.pop()
+            if build or clip and not first:
+                kinds[index] = BUILD
+            elif clip:
+                kinds[index] = CLIP
+            elif not keyed and (first or not value):
+                # tables whose entries were all dropped, like `{nil}`, too
+                kinds[index] = LIST
+    return kinds
+
+
+def json_value(value) -> str:
+    """`value` as `json.dump` writes it."""
+    kind = type(value)
+    if kind is str:
+        return encode_basestring_ascii(value)
+    if kind is int:
+        return int.__repr__(value)
+    if kind is float and math.isfinite(value):
+        return float.__repr__(value)
+    return json.dumps(value)
+
+
+def json_key(key) -> str:
+    return encode_basestring_ascii(key if type(key) is str else json.dumps(key))
+
+
+def iterjson(parser, events, kinds: bytearray, indent=4):
+    """Second pass of `lua_to_json`: yield JSON pieces from `iterparse` events."""
+    if isinstance(indent, int):
+        indent = " " * indent
+    separator = "," if indent is not None else ", "
+    # what comes before the entries at each depth, first or not
+    lines = Indents(indent, separator)
+    # stack of [kind, entries written, skipped depth] for each open table
+    stack = []
+    tables = iter(kinds)
+    key = None
+    for event, value in events:
+        if event == "key":
+            key = value
+            continue
+        if stack:
+            frame = stack[-1]
+            if frame[2]:
+                # inside an entry a Clip table drops
+                if event == "start_table":
+                    next(tables)
+                    frame[2] += 1
+                elif event == "end_table":
+                    frame[2] -= 1
+                continue
+            if event == "end_table":
+                stack.pop()
+                close = "]" if frame[0] == LIST else "}"
+                yield lines.close[len(stack)] + close if frame[1] else close
+                continue
+            kind = frame[0]
+            if kind == CLIP and key != 0:
+                # `finish_table` keeps only the table at key 0, after "Clip"
+                if event == "start_table":
+                    next(tables)
+                    frame[2] = 1
+                continue
+            prefix = lines[len(stack)][frame[1] > 0]
+            frame[1] += 1
+            if kind == DICT:
+                prefix += json_key(key) + ": "
+            elif kind == CLIP:
+                prefix += '"0": "Clip"' + lines[len(stack)][1] + '"1": '
+            yield prefix
+        if event == "value":
+            yield json_value(value)
+            if not stack:
+                return
+            continue
+        kind = next(tables)
+        if kind == BUILD:
+            obj = parser.build(subtree(events, tables))
+            text = json.dumps(obj, indent=indent)
+            if indent is not None:
+                text = text.replace("\n", "\n" + indent * len(stack))
+            yield text
+            if not stack:
+                return
+            continue
+        stack.append([kind, 0, 0])
+        yield "[" if kind == LIST else "{"
+
+
+class Indents(dict):
+    """`(first, next)` prefixes of the entries at each depth, and in `close`
+    the text before the closing bracket."""
+
+    def __init__(self, indent, separator):
+        super().__init__()
+        self.indent, self.separator = indent, separator
+        self.close = {}
+
+    def __missing__(self, depth):
+        line = "" if self.indent is None else "\n" + self.indent * depth
+        self[depth] = (line, self.separator + line)
+        self.close[depth - 1] = (
+            "" if self.indent is None else "\n" + self.indent * (depth - 1)
+        )
+        return self[depth]
+
+
+def subtree(events, tables):
+    """The events of the table that just started, for `FLPP.build`."""
+    yield "start_table", None
+    depth = 1
+    for event, value in events:
+        if event == "start_table":
+            next(tables)
+            depth += 1
+        elif event == "end_table":
+            depth -= 1
+        yield event, value
+        if depth == 0:
+            return
+
+
+def lua_sources(src):
+    """Open the two passes of `lua_to_json` over a file object or Lua data,
+    and return them with what closes them afterwards, if anything."""
+    if isinstance(src, (str,) + BYTES_TYPES):
+        return src, src, None
+    if isinstance(src.read(0), bytes):
+        try:
+            fileno = src.fileno()
+        except OSError:
+            # in-memory streams like `BytesIO` are decoded as they are read
+            src = io.TextIOWrapper(src, encoding="utf-8-sig")
+            return src, RewoundFile(src, src.tell()), src.detach
+        if os.fstat(fileno).st_size == 0:
+            return "", "", None
+        data = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        return data, data, data.close
+    start = src.tell()
+    return src, RewoundFile(src, start), None
+
+
+class RewoundFile:
+    """Reads `fp` again from `start`, once the first pass is done with it."""
+
+    def __init__(self, fp, start):
+        self.fp, self.start = fp, start
+
+    def read(self, size=-1):
+        if self.start is not None:
+            self.fp.seek(self.start)
+            self.start = None
+        return self.fp.read(size)
+
+
+def lua_to_json(parser, src, dst, indent=4, chunk_size=READ_CHUNK_SIZE):
+    first, second, close = lua_sources(src)
+    try:
+        kinds = table_kinds(parser.iterparse(first, chunk_size))
+        events = parser.iterparse(second, chunk_size)
+        write_chunks(dst, iterjson(parser, events, kinds, indent))
+    finally:
+        if close is not None:
+            close()
+
+
+class JSONReader:
+    """Tokenizer of JSON text read from a file object `chunk_size` characters
+    at a time, with the same values as `json.load`."""
+
+    def __init__(self, fp, chunk_size=READ_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.text, self.pos, self.eof = "", 0, False
+
+    def fill(self) -> bool:
+        """Read the next chunk, return False at the end of the file."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(max(self.chunk_size, len(self.text) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def token(self):
+        """Return the next `(kind, value)`, `kind` is a bracket, '"' for
+        strings, "0" for other values or None at the end."""
+        text = self.text
+        match = JSON_TOKEN.match(text, self.pos)
+        # tokens at the end of the buffer may continue in the next chunk
+        if match is not None and (match.end() + 3 <= len(text) or self.eof):
+            self.pos = match.end()
+            group = match.lastindex
+            if group == 1:
+                return match[1], None
+            if group == 2:
+                return '"', match[2]
+            if group == 3:
+                return "0", int(match[3])
+            return "0", float(text[match.start(3) : match.end()])
+        ch = self.char()
+        if ch is None:
+            return None, None
+        if ch == '"':
+            return ch, self.string()
+        if ch in "[]{}":
+            self.pos += 1
+            return ch, None
+        return "0", self.scalar()
+
+    def char(self):
+        """Skip whitespace, return the next character without consuming it."""
+        while True:
+            text = self.text
+            self.pos = JSON_SKIP.match(text, self.pos).end()
+            if self.pos < len(text):
+                return text[self.pos]
+            if not self.fill():
+                return None
+
+    def string(self) -> str:
+        while True:
+            try:
+                value, self.pos = scanstring(self.text, self.pos + 1)
+                return value
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+    def scalar(self):
+        while True:
+            text, pos = self.text, self.pos
+            match = NUMBER_RE.match(text, pos)
+            # numbers and constants may continue in the next chunk
+            if match is None:
+                cut = len(text) - pos < len("-Infinity")
+            else:
+                # like "1." or "1e+" before a digit
+                cut = len(text) - match.end() < len("e+1")
+            if cut and self.fill():
+                continue
+            if match is not None:
+                integer, fraction, exponent = match.groups()
+                self.pos = match.end()
+                if fraction or exponent:
+                    return float(integer + (fraction or "") + (exponent or ""))
+                return int(integer)
+            for word, value in JSON_CONSTANTS.items():
+                if text.startswith(word, pos):
+                    self.pos = pos + len(word)
+                    return value
+            raise ParseError(f"Unexpected {text[pos:pos + 10]!r} while parsing JSON.")
+
+
+def iterjson_events(fp, chunk_size=READ_CHUNK_SIZE):
+    """Yield ("start_table", is_dict), ("key", key), ("value", value) and
+    ("end_table", None) events from a JSON text file object.
+
+    Separators are skipped like whitespace: in objects, strings are keys
+    and values in turn.
+    """
+    reader = JSONReader(fp, chunk_size)
+    # True for each open object
+    stack = []
+    expect_key = False
+    while True:
+        kind, value = reader.token()
+        if kind == '"' and expect_key:
+            expect_key = False
+            yield "key", value
+            continue
+        if kind == "[" or kind == "{":
+            stack.append(kind == "{")
+            expect_key = stack[-1]
+            yield "start_table", stack[-1]
+            continue
+        if kind == "]" or kind == "}":
+            stack.pop()
+            yield "end_table", None
+        elif kind is None:
+            if stack:
+                raise ParseError("Unexpected end of JSON.")
+            return
+        else:
+            yield "value", value
+        if not stack:
+            return
+        expect_key = stack[-1]
+
+
+def lua_scalar(value) -> str:
+    """`value` as `FLPP._iterencode` writes it."""
+    if isinstance(value, str):
+        return f'"{value}"'
+    if isinstance(value, bool):
+        return str(value).lower()
+    if value is None:
+        return "nil"
+    return str(value)
+
+
+def short(value) -> bool:
+    """An item of the lists `FLPP._check_length` writes on one line."""
+    return isinstance(value, Number) or isinstance(value, str) and len(value) < 10
+
+
+def iterlua(parser, events, header=None):
+    """Yield Lua pieces from `iterjson_events`, like `FLPP.iterencode` of the
+    decoded JSON."""
+    newline, tab = parser.newline, parser.tab
+    named_tables = parser.named_tables if newline else frozenset()
+    if header:
+        yield f"{header} "
+    # stack of [is dict, entries written, short items held back or None,
+    # constructor name held back] for each open table
+    stack = []
+    key = None
+    for event, value in events:
+        if event == "key":
+            key = value
+            continue
+        if event == "end_table":
+            _, count, items, name = stack.pop()
+            if items is not None:
+                yield "{" + ",".join(map(lua_scalar, items)) + "}"
+            elif not count:
+                yield "{}"
+            else:
+                if name is not None:
+                    yield f'"{name}"'
+                yield f"{newline}{tab * len(stack)}" + "}"
+            continue
+        if stack:
+            frame = stack[-1]
+            if frame[2] is not None:
+                if event == "value" and short(value):
+                    frame[2].append(value)
+                    continue
+                # not a short list after all, write the items held back
+                items, frame[2] = frame[2], None
+                for item in items:
+                    yield from lua_entry(stack, None, item, newline, tab, named_tables)
+            entry_key = None
+            if frame[0]:
+                entry_key = parser._build_key(key)
+                try:
+                    int(entry_key)
+                    # positional, like in `FLPP._build_content`
+                    entry_key = None
+                except ValueError:
+                    pass
+            item = value if event == "value" else TABLE
+            yield from lua_entry(stack, entry_key, item, newline, tab, named_tables)
+        if event == "value":
+            if not stack:
+                yield lua_scalar(value)
+                return
+            continue
+        stack.append([value, 0, None if value else [], None])
+
+
+def lua_entry(stack, key, value, newline, tab, named_tables):
+    """Yield an entry of the innermost open table, `value` may be `TABLE`."""
+    frame = stack[-1]
+    if not frame[1]:
+        yield "{" + newline
+    name = frame[3]
+    if name is not None:
+        frame[3] = None
+        if key is None and value is TABLE:
+            # named tables are written without quotes and commas, e.g. Merge {
+            yield name + newline
+        else:
+            yield f'"{name}",' + newline
+    elif frame[1]:
+        yield "," + newline
+    indent = tab * len(stack)
+    yield indent if key is None else f"{indent}{key} = "
+    frame[1] += 1
+    if value is TABLE:
+        return
+    if isinstance(value, str) and value in named_tables:
+        frame[3] = value
+    else:
+        yield lua_scalar(value)
+
+
+def json_to_lua(parser, src, dst, header=None, chunk_size=READ_CHUNK_SIZE):
+    events = iterjson_events(src, chunk_size)
+    write_chunks(dst, iterlua(parser, events, header))
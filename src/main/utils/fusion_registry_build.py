@@ -1,5 +1,8 @@
 import json
 import sys
+from pathlib import Path
+
+REGISTRY_PATH = Path(__file__).parent / "fusion_registry_list.json"
 
 try:
     import DaVinciResolveScript as bmd
@@ -21,7 +24,7 @@ def main():
     try:
         reg_list = fu.GetRegList()
         reg = [i.ID for i in reg_list.values()]
-        with open("src/main/utils/fusion_registry_list.json", "w") as out:
+        with open(REGISTRY_PATH, "w") as out:
             json.dump(reg, out)
     except AttributeError:
         print("No Fusion instance found")
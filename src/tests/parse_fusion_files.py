@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from main.flpp import flpp
+from main.flpp import flpp, FILE_HEADERS
 
 FOLDER = Path("src/tests/examples").resolve()
 
@@ -15,15 +15,7 @@ def parse_examples(target_folder: Path):
             continue
         extension = file.suffix
 
-        with open(str(file), "r", encoding="utf-8") as f:
-            if extension == ".comp":
-                lines = f.readlines()
-                lines[0] = "{\n"
-                text = "\n".join(lines)
-            else:
-                text = f.read()
-
-        data = flpp.decode(text)
+        data = flpp.load(file)
         if extension == ".masterprefs":
             data["Locked"] = False
 
@@ -35,10 +27,7 @@ def parse_examples(target_folder: Path):
         parsed_file = output_folder / f"{file_name}_parsed{extension}"
 
         with open(parsed_file, "w", encoding="utf-8") as out:
-            if extension == ".comp":
-                print("Composition", file=out, end=" ")
-            upd = flpp.encode(data)
-            out.write(upd)
+            flpp.dump(data, out, header=FILE_HEADERS.get(extension))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import time
+import asyncio
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp, FLPP, ParseError
+    from src.main.aio import Cancelled, Offload
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp, FLPP, ParseError
+    from main.aio import Cancelled, Offload
+
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        self.folder = Path(tempfile.mkdtemp())
+        for file in EXAMPLES.glob("fusion_*.*"):
+            shutil.copy(file, self.folder / file.name)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_load_save(self):
+        parser = FLPP(nodes=True)
+
+        async def main():
+            for file in EXAMPLES.glob("fusion_*.*"):
+                data = await parser.aload(file)
+                text = file.read_text(encoding="utf-8")
+                self.assertEqual(data, parser.decode(text))
+                target = self.folder / f"saved{file.suffix}"
+                await parser.asave(data, target)
+                self.assertEqual(parser.decode(target.read_text("utf-8")), data)
+            return target
+
+        asyncio.run(main())
+        saved = (self.folder / "saved.comp").read_text(encoding="utf-8")
+        self.assertTrue(saved.startswith("Composition {"))
+        self.assertEqual(list(self.folder.glob("*.tmp")), [])
+
+    def test_iterdir(self):
+        (self.folder / "broken.comp").write_text("{ a = {", encoding="utf-8")
+
+        async def main(**options):
+            return [item async for item in flpp.aiterdir(self.folder, **options)]
+
+        results = dict(asyncio.run(main(pattern="*.*", return_exceptions=True)))
+        self.assertEqual(len(results), 5)
+        self.assertIsInstance(results.pop(self.folder / "broken.comp"), ParseError)
+        for path, data in results.items():
+            self.assertEqual(data, flpp.decode(path.read_text(encoding="utf-8")))
+        with self.assertRaises(ParseError):
+            asyncio.run(main())
+
+    def test_limit(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def job(cancelled):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        offload = Offload(ThreadPoolExecutor(8), limit=2)
+
+        async def main():
+            await asyncio.gather(*(offload.run(job) for _ in range(8)))
+
+        asyncio.run(main())
+        offload.executor.shutdown()
+        self.assertEqual(peak[0], 2)
+        self.assertRaises(ValueError, Offload, limit=0)
+
+    def test_cancel(self):
+        started = threading.Event()
+
+        class BlockedFLPP(FLPP):
+            def dump(self, obj, fp, header=None, chunk_size=1024):
+                fp.write("{")
+                started.set()
+                # blocks until the job is cancelled, then writes again
+                fp.cancelled.wait()
+                super().dump(obj, fp, header, chunk_size)
+
+        target = self.folder / "big.comp"
+        executor = ThreadPoolExecutor(1)
+        offload = Offload(executor, limit=1)
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            task = loop.create_task(
+                BlockedFLPP().asave({"a": 1}, target, offload=offload)
+            )
+            await loop.run_in_executor(None, started.wait)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertFalse(offload.slots().locked())
+
+        asyncio.run(main())
+        executor.shutdown(wait=True)
+        self.assertFalse(target.exists())
+        self.assertEqual(list(self.folder.glob("*.tmp")), [])
+
+    def test_cancel_keeps_slot(self):
+        started, stopping, release = (threading.Event() for _ in range(3))
+
+        def job(cancelled):
+            started.set()
+            cancelled.wait()
+            stopping.set()
+            release.wait()
+            raise Cancelled()
+
+        executor = ThreadPoolExecutor(1)
+        offload = Offload(executor, limit=1)
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            task = loop.create_task(offload.run(job))
+            await loop.run_in_executor(None, started.wait)
+            task.cancel()
+            await loop.run_in_executor(None, stopping.wait)
+            try:
+                # the job still runs, so it still holds its slot
+                self.assertTrue(offload.slots().locked())
+            finally:
+                release.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertFalse(offload.slots().locked())
+
+        asyncio.run(main())
+        executor.shutdown(wait=True)
+
+    def test_processes(self):
+        parser = FLPP(nodes=True, intern="keys")
+        parser.register_named_tables(["AsyncFuse"])
+        with ProcessPoolExecutor(2) as executor:
+            offload = Offload(executor)
+
+            async def main():
+                data = await parser.aload(
+                    self.folder / "fusion_composition.comp", offload
+                )
+                await parser.asave(data, self.folder / "copy.comp", offload=offload)
+                return data, [
+                    item async for item in parser.aiterdir(self.folder, offload=offload)
+                ]
+
+            data, items = asyncio.run(main())
+        self.assertEqual(len(items), 2)
+        for path, loaded in items:
+            self.assertEqual(loaded, data)
+
+
+if __name__ == "__main__":
+    unittest.main()
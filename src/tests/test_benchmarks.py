@@ -0,0 +1,67 @@
+import unittest
+
+try:
+    from src.main.flpp import flpp, FLPP
+    from src.benchmarks.generate import generate_comp
+    from src.benchmarks.run import run, compare
+    from src.benchmarks import bench_async
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp, FLPP
+    from benchmarks.generate import generate_comp
+    from benchmarks.run import run, compare
+    from benchmarks import bench_async
+
+
+class TestGenerator(unittest.TestCase):
+    def test_generated_comp(self):
+        text = generate_comp(tools=60, depth=3, seed=1)
+        self.assertIn("ordered()", text)
+        self.assertIn('["Gamut.SLogVersion"]', text)
+        self.assertIn("-- ", text)
+        data = flpp.decode(text)
+        self.assertEqual(data, FLPP(engine="char").decode(text))
+        self.assertEqual(flpp.decode(flpp.encode(data)), data)
+        self.assertEqual(generate_comp(tools=60, depth=3, seed=1), text)
+
+    def test_size(self):
+        text = generate_comp(size=30_000, seed=2)
+        self.assertGreaterEqual(len(text), 30_000)
+        self.assertLess(len(text), 60_000)
+        self.assertTrue(generate_comp(tools=5, header=True).startswith("Composition {"))
+
+
+class TestRun(unittest.TestCase):
+    def test_results(self):
+        lines = []
+        results = run(sizes=[5_000], runs=2, warmups=0, report=lines.append)
+        benchmarks = results["benchmarks"]
+        self.assertEqual(
+            set(benchmarks), {"decode_5000", "encode_5000", "round_trip_5000"}
+        )
+        self.assertEqual(len(lines), 3)
+        for result in benchmarks.values():
+            self.assertEqual(len(result["values"]), 2)
+            self.assertGreater(result["peak_memory"], 0)
+        self.assertEqual(len(compare(results, results)), 3)
+
+
+class TestAsyncLatency(unittest.TestCase):
+    def test_results(self):
+        lines = []
+        results = bench_async.run(
+            count=3,
+            copies=1,
+            limit=2,
+            modes=("blocking", "threads"),
+            report=lines.append,
+        )
+        self.assertEqual(set(results), {"blocking", "threads"})
+        self.assertEqual(len(lines), 2)
+        for result in results.values():
+            self.assertEqual(result["files"], 3)
+            self.assertGreaterEqual(result["max_lag"], result["p99_lag"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import unittest
+from array import array
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp, FLPP, NamedTable, ParseError, numpy
+    from src.main.binary import dumps_binary, loads_binary, MAGIC
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp, FLPP, NamedTable, ParseError, numpy
+    from main.binary import dumps_binary, loads_binary, MAGIC
+
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+class TestBinary(unittest.TestCase):
+    def test_examples(self):
+        parsers = [FLPP(), FLPP(nodes=True), FLPP(arrays="array")]
+        if numpy is not None:
+            parsers.append(FLPP(nodes=True, arrays="numpy"))
+        for file in EXAMPLES.glob("fusion_*.*"):
+            text = file.read_text(encoding="utf-8")
+            for parser in parsers:
+                data = parser.decode(text)
+                out = io.BytesIO()
+                parser.dump_binary(data, out)
+                back = parser.load_binary(io.BytesIO(out.getvalue()))
+                with self.subTest(
+                    file=file.name, nodes=parser.nodes, arrays=parser.arrays
+                ):
+                    self.assertEqual(parser.encode(back), parser.encode(data))
+                    if not parser.arrays:
+                        self.assertEqual(back, data)
+
+    def test_values(self):
+        data = {
+            "name": "Merge1",
+            "names": ["Merge1", "Merge1", "x" * 100, "x" * 100],
+            1: None,
+            True: False,
+            "numbers": [1, -1.5, 2**53, 1e308],
+            "ints": [127, -129, 2**40, -(2**70)],
+            "floats": [0.0, -0.0, float("inf")],
+            "empty": [[], {}],
+            "node": NamedTable("Loader", {"Clips": [NamedTable("Clip", {})]}),
+            "array": array("d", [1001, 0.25]),
+            "raw": b"\x00\xff",
+            "text": ["Ünï", "", "a\x00b"],
+        }
+        back = loads_binary(dumps_binary(data))
+        self.assertEqual(back, data)
+        for key, value in data.items():
+            self.assertIs(type(back[key]), type(value))
+        self.assertEqual([type(x) for x in back["numbers"]], [int, float, int, float])
+        self.assertEqual(flpp.encode(back), flpp.encode(data))
+
+    def test_shared_strings(self):
+        one = len(dumps_binary([{"ViewInfo": 1}]))
+        many = len(dumps_binary([{"ViewInfo": 1}] * 10))
+        self.assertLess(many - one, 9 * len("ViewInfo"))
+
+    def test_errors(self):
+        with self.assertRaises(ParseError):
+            loads_binary(b"{}")
+        with self.assertRaises(ParseError):
+            loads_binary(MAGIC + b"\x63\x00")
+        data = dumps_binary({"a": [1, 2], "b": NamedTable("Clip", {})})
+        for end in range(len(data)):
+            with self.subTest(end=end), self.assertRaises(ParseError):
+                loads_binary(data[:end])
+        with self.assertRaises(TypeError):
+            dumps_binary({"a": object()})
+
+
+if __name__ == "__main__":
+    unittest.main()
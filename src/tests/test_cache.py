@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from src.main.flpp import flpp, FLPP
+    from src.main.cache import DecodeCache
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp, FLPP
+    from main.cache import DecodeCache
+
+EXAMPLES = Path(__file__).parent / "examples"
+COMP = EXAMPLES / "fusion_composition.comp"
+
+
+def load_comp(cache_dir):
+    return flpp.load(COMP, cache_dir=cache_dir, cache_size=1 << 20)
+
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        self.folder = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_load(self):
+        text = COMP.read_text(encoding="utf-8")
+        expected = flpp.decode(text)
+        self.assertEqual(flpp.load(COMP), expected)
+        cache = DecodeCache(self.folder)
+        self.assertEqual(flpp.load(COMP, cache_dir=cache), expected)
+        self.assertEqual(flpp.load(COMP, cache_dir=cache), expected)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        self.assertEqual(stats["bytes_written"], stats["bytes_read"])
+        self.assertEqual(stats["size"], stats["bytes_written"])
+
+    def test_key(self):
+        data = COMP.read_bytes()
+        keys = {
+            flpp.cache_key(data, ".comp"),
+            flpp.cache_key(data + b" ", ".comp"),
+            FLPP(nodes=True).cache_key(data, ".comp"),
+            FLPP(arrays="array").cache_key(data, ".comp"),
+        }
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(flpp.cache_key(data, ".comp"), FLPP().cache_key(data, ".comp"))
+
+    def test_lru_eviction(self):
+        cache = DecodeCache(self.folder, max_size=400)
+        for i in range(3):
+            cache.put(f"key{i}", "x" * 100)
+            os.utime(cache.path(f"key{i}"), (i, i))
+        # reading key0 makes key1 the least recently used entry
+        self.assertEqual(cache.get("key0"), (True, "x" * 100))
+        cache.put("key3", "x" * 100)
+        self.assertEqual(cache.get("key1"), (False, None))
+        self.assertTrue(cache.get("key0")[0])
+        self.assertLessEqual(cache.stats()["size"], 400)
+        self.assertGreater(cache.evictions, 0)
+
+    def test_processes(self):
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(load_comp, [self.folder] * 16))
+        for result in results:
+            self.assertEqual(result, results[0])
+        self.assertEqual(DecodeCache(self.folder).stats()["entries"], 1)
+        self.assertEqual(list(self.folder.glob("*.tmp")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from contextlib import redirect_stderr, redirect_stdout
+
+try:
+    from src.main.cli import main
+except ModuleNotFoundError:
+    # running tests locally
+    from main.cli import main
+
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+class TestConvert(unittest.TestCase):
+    def setUp(self):
+        self.folder = Path(tempfile.mkdtemp())
+        for file in EXAMPLES.glob("fusion_*.*"):
+            shutil.copy(file, self.folder)
+        self.state = str(self.folder / "state.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def run_cli(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            code = main(["convert", *args, "--state", self.state])
+        return code, out.getvalue(), err.getvalue()
+
+    def test_round_trip(self):
+        for jobs in ("1", "2"):
+            with self.subTest(jobs=jobs):
+                code, out, _ = self.run_cli(str(self.folder), "-j", jobs, "--force")
+                self.assertEqual(code, 0)
+                self.assertIn("4 converted, 0 skipped, 0 failed", out)
+                self.assertIn("files/s", out)
+
+        with open(self.folder / "fusion_setting.setting.json", encoding="utf-8") as f:
+            data = json.load(f)
+        with open(
+            EXAMPLES / "output" / "fusion_setting_intermediate.json", encoding="utf-8"
+        ) as f:
+            self.assertEqual(data, json.load(f))
+
+        back = self.folder / "back"
+        code, _, _ = self.run_cli(
+            str(self.folder / "*.json"), "--to", "lua", "-o", str(back), "-j", "1"
+        )
+        self.assertEqual(code, 0)
+        for name in ("fusion_composition.comp", "fusion_prefs.prefs"):
+            parsed = Path(name)
+            expected = EXAMPLES / "output" / f"{parsed.stem}_parsed{parsed.suffix}"
+            self.assertEqual(
+                (back / name).read_text(encoding="utf-8"),
+                expected.read_text(encoding="utf-8"),
+            )
+
+    def test_skips_unchanged(self):
+        self.run_cli(str(self.folder), "-j", "1")
+        _, out, _ = self.run_cli(
+            str(self.folder / "*.comp"), str(self.folder), "-j", "1"
+        )
+        self.assertIn("0 converted, 4 skipped", out)
+
+        # touched but identical files are skipped by their hash
+        (self.folder / "fusion_setting.setting").touch()
+        _, out, _ = self.run_cli(str(self.folder), "-j", "1")
+        self.assertIn("0 converted, 4 skipped", out)
+
+    def test_errors_do_not_abort(self):
+        (self.folder / "broken.setting").write_text("{ a = ", encoding="utf-8")
+        code, out, err = self.run_cli(str(self.folder), "-j", "2")
+        self.assertEqual(code, 1)
+        self.assertIn("4 converted, 0 skipped, 1 failed", out)
+        self.assertIn("broken.setting: ParseError", err)
+
+    def test_profile(self):
+        report = self.folder / "profile.json"
+        code, _, _ = self.run_cli(str(self.folder), "-j", "2", "--profile", str(report))
+        self.assertEqual(code, 0)
+        with open(report, encoding="utf-8") as f:
+            profile = json.load(f)
+        self.assertEqual(profile["calls"], {"decode": 4})
+        self.assertGreater(profile["tokens"]["tables"], 0)
+        self.assertGreater(profile["rates"]["decode"], 0)
+        self.assertTrue(profile["largest"][0]["path"].startswith(str(self.folder)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp, FLPP, NamedTable, tree_digests
+    from src.main.diff import Change, Conflict, ADDED, REMOVED, CHANGED
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp, FLPP, NamedTable, tree_digests
+    from main.diff import Change, Conflict, ADDED, REMOVED, CHANGED
+
+EXAMPLES = Path(__file__).parent / "examples"
+COMP = (EXAMPLES / "fusion_composition.comp").read_text(encoding="utf-8")
+
+
+class TestDigests(unittest.TestCase):
+    def test_decode_matches_tree(self):
+        for parser in (flpp, FLPP(nodes=True), FLPP(arrays="array")):
+            data, digests = parser.hashed(COMP)
+            self.assertEqual(tree_digests(data), digests)
+
+    def test_values(self):
+        digest = lambda obj: tree_digests(obj)[id(obj)]
+        self.assertEqual(digest({"a": [1, 2]}), digest({"a": [1, 2]}))
+        self.assertNotEqual(digest({"a": [1, 2]}), digest({"a": [2, 1]}))
+        self.assertNotEqual(digest({"a": 1}), digest({"a": 1.0}))
+        self.assertNotEqual(digest({"a": "1"}), digest({"a": 1}))
+        self.assertNotEqual(digest([{}]), digest([[]]))
+        self.assertNotEqual(
+            digest(NamedTable("Merge", {})), digest(NamedTable("Blur", {}))
+        )
+
+
+class TestDiff(unittest.TestCase):
+    nodes = FLPP(nodes=True)
+
+    def test_identical(self):
+        self.assertEqual(flpp.diff(COMP, COMP), [])
+
+    def test_changes(self):
+        changed = flpp.patch(
+            COMP,
+            {
+                "CurrentTime": 5,
+                "Tools.exr.Clips[0].Filename": "X:/new.exr",
+                "Tools.exr.ViewInfo": {"Flags": {"ShowPic": True}},
+            },
+        )
+        changes = self.nodes.diff(COMP, changed)
+        self.assertEqual(
+            [(change.kind, change.key_path) for change in changes],
+            [
+                (CHANGED, "CurrentTime"),
+                (CHANGED, "Tools.exr.Clips[0].Filename"),
+                (CHANGED, "Tools.exr.ViewInfo"),
+            ],
+        )
+        self.assertEqual(changes[1].new, "X:/new.exr")
+
+    def test_added_removed(self):
+        old = {"a": 1, "b": {"c": [1, 2, 3]}}
+        new = {"b": {"c": [1, 2]}, "d": 2}
+        self.assertEqual(
+            flpp.diff(old, new),
+            [
+                Change(REMOVED, ("a",), 1, None),
+                Change(ADDED, ("d",), None, 2),
+                Change(REMOVED, ("b", "c", 2), 3, None),
+            ],
+        )
+        self.assertEqual(
+            str(flpp.diff({"a.b": 1}, {"a.b": 2})[0]), 'changed ["a.b"]: 1 -> 2'
+        )
+
+
+class TestMerge(unittest.TestCase):
+    nodes = FLPP(nodes=True)
+
+    def test_merge(self):
+        ours = flpp.patch(COMP, {"CurrentTime": 5, "Tools.exr.Clips[0].Filename": "X"})
+        theirs = flpp.patch(COMP, {"RenderRange[1]": 2000, "CurrentTime": 5})
+        merged, conflicts = self.nodes.merge(COMP, ours, theirs)
+        self.assertEqual(conflicts, [])
+        expected = self.nodes.decode(ours)
+        expected["RenderRange"][1] = 2000
+        self.assertEqual(self.nodes.decode(merged), expected)
+
+    def test_conflicts(self):
+        base = {"a": 1, "b": {"c": 1}, "l": [1, 2, 3], "r": 0}
+        ours = {"a": 2, "b": {"c": 2}, "l": [1, 2, 3], "r": 0}
+        theirs = {"a": 3, "b": 4, "l": [1], "r": 1}
+        merged, conflicts = flpp.merge(base, ours, theirs)
+        self.assertEqual(
+            conflicts,
+            [Conflict(("a",), 1, 2, 3), Conflict(("b",), {"c": 1}, {"c": 2}, 4)],
+        )
+        self.assertEqual(flpp.decode(merged), {"a": 2, "b": {"c": 2}, "l": [1], "r": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
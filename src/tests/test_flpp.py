@@ -1,10 +1,30 @@
+import io
+import os
+import mmap
+import json
+import sys
+import shutil
+import tempfile
+import subprocess
 import unittest
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 try:
-    from src.main.flpp import flpp
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from src.main.flpp import flpp, FLPP, FILE_HEADERS, ENGINES, ParseError
+    from src.main.flpp import register_named_tables, NamedTable
 except ModuleNotFoundError:
     # running tests locally
-    from main.flpp import flpp
+    from main.flpp import flpp, FLPP, FILE_HEADERS, ENGINES, ParseError
+    from main.flpp import register_named_tables, NamedTable
+
+EXAMPLES = Path(__file__).parent / "examples"
 
 
 # Utility functions
@@ -47,6 +67,20 @@ def differ(value, origin):
     assert value == origin, error_message
 
 
+def read_example(file: Path):
+    # mirrors the preprocessing done in parse_fusion_files.py
+    with open(file, "r", encoding="utf-8") as f:
+        if file.suffix == ".comp":
+            lines = f.readlines()
+            lines[0] = "{\n"
+            return "\n".join(lines)
+        return f.read()
+
+
+def example_files():
+    return sorted(EXAMPLES.glob("fusion_*.*"))
+
+
 class TestUtilityFunctions(unittest.TestCase):
     def test_is_iterator(self):
         self.assertTrue(is_iterator(list()))
@@ -197,5 +231,599 @@ class Testflpp(unittest.TestCase):
         )
 
 
+class TestEngines(unittest.TestCase):
+    char = FLPP(engine="char")
+    regex = FLPP(engine="regex")
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, FLPP, engine="lpeg")
+
+    def test_parity_snippets(self):
+        snippets = [
+            "3",
+            "-0.45",
+            "-3.23e+17",
+            "0x3a",
+            "3e5",
+            "1.",
+            "- 1",
+            "007",
+            "true",
+            "nilly",
+            '{ 43, 54.3, false, string = "value", 9, [4] = 111, [2.1] = "text" }',
+            "{0, 1, 0}",
+            r"'test\'s string'",
+            r'"back\\slash\n"',
+            '{ [0] = [[ ("word") . ["word"] ]], [1] = "a"}',
+            '-- c\n{\n["a"] = "b" -- t\n--[[\n["c"] = 1,\n]]}\n-- e',
+            "{ Clips = { Clip { ID = 1 } }, Value = FuID { \"SLog2\" }, }",
+            "{ Tools = ordered() { A = Merge { Inputs = {}, }, } }",
+            "{nil}",
+            "{,}",
+            "{ a = {nil} }",
+            "{ Clip nil }",
+        ]
+        for data in snippets:
+            with self.subTest(data=data):
+                self.assertEqual(self.regex.decode(data), self.char.decode(data))
+
+    def test_parity_examples(self):
+        for file in example_files():
+            with self.subTest(file=file.name):
+                text = read_example(file)
+                data = self.regex.decode(text)
+                self.assertEqual(data, self.char.decode(text))
+                if file.suffix == ".masterprefs":
+                    data["Locked"] = False
+                with open(
+                    EXAMPLES / "output" / f"{file.stem}_intermediate.json",
+                    "r",
+                    encoding="utf-8",
+                ) as f:
+                    self.assertEqual(json.loads(json.dumps(data)), json.load(f))
+
+
+class TestEncoder(unittest.TestCase):
+    def test_named_tables(self):
+        self.assertEqual(
+            flpp.encode({"png": "Loader", 1: {"NameSet": True}}),
+            "{\n\tpng = Loader\n\t{\n\t\tNameSet = true\n\t}\n}",
+        )
+        self.assertEqual(
+            flpp.encode(["ordered()", []]), "{\n\tordered()\n\t{}\n}"
+        )
+        # not a registered constructor, or not followed by a positional table
+        self.assertEqual(
+            flpp.encode(["Unknown", {}]), '{\n\t"Unknown",\n\t{}\n}'
+        )
+        self.assertEqual(
+            flpp.encode({"a": "Loader", "b": {}}), '{\n\ta = "Loader",\n\tb = {}\n}'
+        )
+
+    def test_examples_byte_identical(self):
+        for file in example_files():
+            with self.subTest(file=file.name):
+                data = flpp.decode(read_example(file))
+                if file.suffix == ".masterprefs":
+                    data["Locked"] = False
+                text = flpp.encode(data, header=FILE_HEADERS.get(file.suffix))
+                parsed = EXAMPLES / "output" / f"{file.stem}_parsed{file.suffix}"
+                with open(parsed, "r", encoding="utf-8") as f:
+                    self.assertEqual(text, f.read())
+
+
+class TestDump(unittest.TestCase):
+    data = {"Tools": ["ordered()", {"A": "Merge", 1: {"Inputs": {}}}], "Pos": [1, 2]}
+
+    def test_iterencode(self):
+        pieces = list(flpp.iterencode(self.data))
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual("".join(pieces), flpp.encode(self.data))
+
+    def test_header(self):
+        self.assertEqual(flpp.encode({}, header="Composition"), "Composition {}")
+        self.assertEqual(flpp.encode({}, header=None), "{}")
+
+    def test_dump_chunks(self):
+        writes = []
+
+        class Recorder:
+            def write(self, text):
+                writes.append(text)
+
+        flpp.dump(self.data, Recorder(), chunk_size=8)
+        self.assertGreater(len(writes), 1)
+        self.assertEqual("".join(writes), flpp.encode(self.data))
+
+        out = io.StringIO()
+        flpp.dump(self.data, out, header="Composition")
+        self.assertEqual(out.getvalue(), flpp.encode(self.data, header="Composition"))
+
+
+class TestIterparse(unittest.TestCase):
+    def test_events(self):
+        events = list(flpp.iterparse('{ a = Input { Value = 1 }, "b", }'))
+        self.assertEqual(
+            events,
+            [
+                ("start_table", None),
+                ("key", "a"),
+                ("value", "Input"),
+                ("key", 1),
+                ("start_table", None),
+                ("key", "Value"),
+                ("value", 1),
+                ("end_table", None),
+                ("key", 2),
+                ("value", "b"),
+                ("end_table", None),
+            ],
+        )
+        self.assertEqual(list(flpp.iterparse("4.1")), [("value", 4.1)])
+
+    def test_unexpected_end(self):
+        self.assertRaises(ParseError, list, flpp.iterparse("{ a = { b = 1 }"))
+        self.assertRaises(ParseError, list, flpp.iterparse('{ a = "b }'))
+
+    def test_chunked_examples(self):
+        char = FLPP(engine="char")
+        for file in example_files():
+            text = read_example(file)
+            expected = char.decode(text)
+            for chunk_size in (1, 3, 64, 4096):
+                with self.subTest(file=file.name, chunk_size=chunk_size):
+                    events = flpp.iterparse(io.StringIO(text), chunk_size=chunk_size)
+                    self.assertEqual(flpp.build(events), expected)
+
+    def test_chunk_boundaries(self):
+        # every split position of tokens that need lookahead
+        data = '--[[ c ]]\n{ a = "x\\"y", b = [[s]], c = -1.5e+3, d = 0x1F, [2] = nil }'
+        expected = flpp.decode(data)
+        for chunk_size in range(1, len(data) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                events = flpp.iterparse(io.StringIO(data), chunk_size=chunk_size)
+                self.assertEqual(flpp.build(events), expected)
+
+
+class TestSelect(unittest.TestCase):
+    comp = read_example(EXAMPLES / "fusion_composition.comp")
+
+    def test_selected_branches(self):
+        full = flpp.decode(self.comp)
+        self.assertEqual(flpp.decode(self.comp, select=["*"]), full)
+        self.assertEqual(flpp.decode(self.comp, select=["Tools"]), {"Tools": full["Tools"]})
+        self.assertEqual(
+            flpp.decode(self.comp, select=["CurrentTime", "RenderRange"]),
+            {"CurrentTime": full["CurrentTime"], "RenderRange": full["RenderRange"]},
+        )
+
+    def test_wildcards(self):
+        full = flpp.decode(self.comp)
+        result = flpp.decode(self.comp, select=["Tools.*.Clips.*.Filename"])
+        expected = {
+            key: {"Clips": {1: {"Filename": tool["Clips"][1]["Filename"]}}}
+            for key, tool in full["Tools"].items()
+            if isinstance(tool, dict) and "Clips" in tool
+        }
+        self.assertEqual(result, {"Tools": expected})
+        self.assertEqual(len(expected), 3)
+
+    def test_dotted_keys(self):
+        data = '{ Inputs = { ["Gamut.SLogVersion"] = { Value = 1 }, Other = { Value = 2 } } }'
+        self.assertEqual(
+            flpp.decode(data, select=[("Inputs", "Gamut.SLogVersion")]),
+            {"Inputs": {"Gamut.SLogVersion": {"Value": 1}}},
+        )
+
+    def test_skipped_tables(self):
+        # strings and comments with braces inside skipped tables
+        data = '{ a = { b = "}", c = [[ { ]], -- }\n d = { \'{\' } }, e = 1 }'
+        self.assertEqual(flpp.decode(data, select=["e"]), {"e": 1})
+        self.assertEqual(flpp.decode(data, select=["x"]), {})
+        self.assertRaises(ParseError, flpp.decode, "{ a = { b = 1 }", select=["x"])
+
+
+class TestNodes(unittest.TestCase):
+    nodes = FLPP(nodes=True)
+
+    def test_named_tables(self):
+        data = '{ png = Loader { Clips = { Clip { ID = "a" } }, }, t = ordered() { m = MyFuse { x = 1 } }, p = { 1, 2 } }'
+        self.assertEqual(
+            self.nodes.decode(data),
+            {
+                "png": NamedTable(
+                    "Loader", {"Clips": [NamedTable("Clip", {"ID": "a"})]}
+                ),
+                "t": NamedTable("ordered()", {"m": NamedTable("MyFuse", {"x": 1})}),
+                "p": [1, 2],
+            },
+        )
+        # constructors are known from the syntax, without the registry
+        self.assertIn("m = MyFuse\n", self.nodes.encode(self.nodes.decode(data)))
+        self.assertEqual(
+            self.nodes.encode(NamedTable("FuID", ["SLog2"])), 'FuID {"SLog2"}'
+        )
+
+    def test_examples(self):
+        for file in example_files():
+            with self.subTest(file=file.name):
+                text = read_example(file)
+                data = self.nodes.decode(text)
+                self.assertEqual(
+                    self.nodes.encode(data), flpp.encode(flpp.decode(text))
+                )
+                self.assertEqual(self.nodes.decode(self.nodes.encode(data)), data)
+
+    def test_select(self):
+        comp = read_example(EXAMPLES / "fusion_composition.comp")
+        result = self.nodes.decode(comp, select=["Tools.*.Clips"])
+        for tool in result["Tools"].values():
+            self.assertEqual(tool.type, "Loader")
+            self.assertEqual(tool.fields["Clips"][0].type, "Clip")
+
+    def test_char_engine(self):
+        self.assertRaises(ValueError, FLPP, engine="char", nodes=True)
+
+    def test_empty_keys_to_list(self):
+        self.assertEqual(flpp._empty_keys_to_list({0: "a", 1: "b"}), ["a", "b"])
+        self.assertEqual(flpp._empty_keys_to_list({1: "a", 0: "b"}), ["b", "a"])
+
+
+class TestArrays(unittest.TestCase):
+    arrays = FLPP(arrays="array")
+    data = '{ Pos = { 110, 49.5 }, K = { [1001] = { 0.5, LH = { 1000.6, -2e+3 }, }, }, E = {}, M = { 1, "a" }, B = { true, 1 }, C = { 1, -- c\n 2 } }'
+
+    def test_numeric_tables(self):
+        self.assertEqual(
+            self.arrays.decode(self.data),
+            {
+                "Pos": array("d", [110, 49.5]),
+                "K": {"[1001]": {0: 0.5, "LH": array("d", [1000.6, -2000])}},
+                "E": {},
+                "M": [1, "a"],
+                "B": [True, 1],
+                "C": array("d", [1, 2]),
+            },
+        )
+        self.assertEqual(
+            FLPP(engine="char", arrays="array").decode(self.data),
+            self.arrays.decode(self.data),
+        )
+
+    def test_encode(self):
+        self.assertEqual(
+            self.arrays.encode(array("d", [1001, 0.5, -2])), "{1001,0.5,-2}"
+        )
+        self.assertEqual(
+            self.arrays.encode({"a": "FuID", 1: array("d", [1])}),
+            "{\n\ta = FuID\n\t{1}\n}",
+        )
+        for file in example_files():
+            with self.subTest(file=file.name):
+                text = read_example(file)
+                data = self.arrays.decode(text)
+                self.assertEqual(
+                    self.arrays.encode(data), flpp.encode(flpp.decode(text))
+                )
+                events = self.arrays.iterparse(
+                    io.StringIO(text), chunk_size=7, arrays=True
+                )
+                self.assertEqual(self.arrays.build(events), data)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        data = FLPP(arrays="numpy").decode(self.data)
+        self.assertIsInstance(data["Pos"], numpy.ndarray)
+        self.assertEqual(data["Pos"].tolist(), [110, 49.5])
+        # tables of arrays are checked for the Loader clip fix too
+        data = FLPP(arrays="numpy").decode("{ { 1, 2 }, { 3, 4 } }")
+        self.assertEqual([item.tolist() for item in data], [[1, 2], [3, 4]])
+        self.assertEqual(
+            flpp.encode(numpy.array([[1, 2.5], [3, 4]])), "{\n\t{1,2.5},\n\t{3,4}\n}"
+        )
+
+    def test_options(self):
+        self.assertRaises(ValueError, FLPP, arrays="list")
+
+
+class TestPatch(unittest.TestCase):
+    comp = read_example(EXAMPLES / "fusion_composition.comp")
+
+    def test_spans(self):
+        data = '{ a = { b = "x" }, c = Loader { d = 1 }, { 1, 2 }, "e" }'
+        spans = flpp.spans(data)
+        self.assertEqual(
+            {path: data[start:end] for path, (start, end) in spans.items()},
+            {
+                ("a", "b"): '"x"',
+                ("a",): '{ b = "x" }',
+                ("c", "d"): "1",
+                ("c",): "Loader { d = 1 }",
+                (2, 0): "1",
+                (2, 1): "2",
+                (2,): "{ 1, 2 }",
+                (3,): '"e"',
+                (): data,
+            },
+        )
+        events = flpp.iterparse(io.StringIO(data), 2, named_tables=True, spans=True)
+        self.assertEqual(dict(flpp._iterspans(events)), spans)
+        self.assertEqual(
+            flpp.spans(data, select=["c"]),
+            {k: spans[k] for k in [("c", "d"), ("c",), (3,), ()]},
+        )
+
+    def test_patch(self):
+        changes = {
+            "Tools.exr.Clips[0].Filename": "X:/new.exr",
+            "CurrentTime": 5,
+            ("Tools", "exr", "ViewInfo"): {"Pos": [1, 2]},
+        }
+        patched = flpp.patch(self.comp, changes)
+        nodes = FLPP(nodes=True)
+        expected = nodes.decode(self.comp)
+        expected["CurrentTime"] = 5
+        exr = expected["Tools"]["exr"].fields
+        exr["Clips"][0].fields["Filename"] = "X:/new.exr"
+        exr["ViewInfo"] = {"Pos": [1, 2]}
+        self.assertEqual(nodes.decode(patched), expected)
+        # everything outside the changed values is kept as it was
+        start = self.comp.index("CurrentTime = 1381")
+        self.assertEqual(patched[:start], self.comp[:start])
+        self.assertEqual(patched[-1000:], self.comp[-1000:])
+        self.assertIn("\t\t\tViewInfo = {\n\t\t\t\tPos = {1,2}\n\t\t\t},", patched)
+
+    def test_errors(self):
+        self.assertRaises(KeyError, flpp.patch, self.comp, {"Tools.missing": 1})
+        self.assertRaises(
+            ValueError,
+            flpp.patch,
+            self.comp,
+            {"RenderRange": [1, 2], "RenderRange[0]": 1},
+        )
+
+
+class TestBytes(unittest.TestCase):
+    def test_examples(self):
+        char = FLPP(engine="char")
+        for file in example_files():
+            with self.subTest(file=file.name):
+                expected = flpp.decode(read_example(file))
+                data = file.read_bytes()
+                self.assertEqual(flpp.decode(data), expected)
+                self.assertEqual(flpp.decode(memoryview(data)), expected)
+                self.assertEqual(char.decode(data), expected)
+                with open(file, "rb") as f:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                        self.assertEqual(flpp.decode(m), expected)
+                self.assertEqual(flpp.load(file), expected)
+
+    def test_strings(self):
+        data = '{ a = "x\\"y", b = [[l]], c = "é\\\\", d = \'q\', g = "ü" --[[ c ]] }'
+        self.assertEqual(flpp.decode(data.encode("utf-8")), flpp.decode(data))
+        self.assertEqual(flpp.decode(data.encode("utf-8"))["g"], "ü")
+        self.assertRaises(ParseError, flpp.decode, b'{ a = "b }')
+
+    def test_non_ascii(self):
+        snippets = [
+            "{ é = 1 }",
+            "{ a = Fuse.Ünï { b = 1 }, bé = é }",
+            "{ a = x’y }",
+            "\ufeff{ a = 1 }",
+            "\ufeffComposition { a = 1 }",
+        ]
+        for data in snippets:
+            with self.subTest(data=data):
+                self.assertEqual(flpp.decode(data.encode("utf-8")), flpp.decode(data))
+
+    def test_header(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                parser = FLPP(engine=engine)
+                self.assertEqual(parser.decode("Composition { a = 1 }"), {"a": 1})
+                self.assertEqual(parser.decode(b"Composition {\n a = 1 }"), {"a": 1})
+                self.assertEqual(parser.decode("Composition"), "Composition")
+
+
+class TestThreads(unittest.TestCase):
+    def setUp(self):
+        # switch threads often, so shared parser state would be corrupted
+        self.interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    def test_concurrent_decode(self):
+        texts = [read_example(file) for file in example_files()] * 8
+        for engine in ("regex", "char"):
+            parser = FLPP(engine=engine)
+            expected = [parser.decode(text) for text in texts]
+            with self.subTest(engine=engine):
+                with ThreadPoolExecutor(max_workers=16) as pool:
+                    results = list(pool.map(parser.decode, texts))
+                self.assertEqual(results, expected)
+
+    def test_concurrent_encode(self):
+        data = [flpp.decode(read_example(file)) for file in example_files()] * 8
+        expected = [flpp.encode(obj) for obj in data]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(flpp.encode, data))
+        self.assertEqual(results, expected)
+
+
+class TestDeepNesting(unittest.TestCase):
+    # well past the recursion limit, checked by walking down the tables, as
+    # comparing or printing them would recurse
+    depth = 12_000
+
+    def walk(self, data, key):
+        levels = 0
+        while isinstance(data, (dict, list)) and data:
+            data = data[key]
+            levels += 1
+        return levels, data
+
+    def test_decode(self):
+        self.assertGreater(self.depth, sys.getrecursionlimit())
+        keyed = "{ a = " * self.depth + "1" + " }" * self.depth
+        positional = "{" * self.depth + "}" * self.depth
+        for engine in ENGINES:
+            parser = FLPP(engine=engine)
+            with self.subTest(engine=engine):
+                self.assertEqual(self.walk(parser.decode(keyed), "a"), (self.depth, 1))
+                levels, leaf = self.walk(parser.decode(positional), 0)
+                self.assertEqual((levels, leaf), (self.depth - 1, {}))
+
+    def test_encode(self):
+        data = leaf = {}
+        for _ in range(self.depth):
+            data = {"a": data, "b": [data] if data is leaf else 1}
+        # without indentation, which would grow with the square of the depth
+        parser = FLPP(nodes=True)
+        parser.tab = ""
+        text = parser.encode(data)
+        self.assertEqual(text.count("a = {"), self.depth)
+        self.assertEqual(self.walk(flpp.decode(text), "a"), (self.depth, {}))
+        nested = NamedTable("Input", [])
+        for _ in range(self.depth):
+            nested = NamedTable("Input", [nested])
+        text = parser.encode(nested)
+        self.assertEqual(text.count("Input"), self.depth + 1)
+        # the outermost constructor is read back as a header
+        data, levels = FLPP(nodes=True).decode(text), 0
+        while data:
+            data, levels = data[0].fields, levels + 1
+        self.assertEqual(levels, self.depth)
+
+
+class TestIntern(unittest.TestCase):
+    text = """{
+        A = Merge { Inputs = { Blend = Input { Value = 0.5, }, Size = Input { Value = 1001, }, }, },
+        B = Merge { Inputs = { Blend = Input { Value = 0.5, }, Size = Input { Value = 1001, }, }, },
+        ["Gamut.SLogVersion"] = "Merge1", ["Gamut.SLogVersion2"] = "Merge1",
+    }"""
+
+    def test_examples(self):
+        for intern in ("keys", "values"):
+            parsers = [FLPP(intern=intern), FLPP(nodes=True, intern=intern)]
+            for file in example_files():
+                text = read_example(file)
+                for parser in parsers:
+                    with self.subTest(file=file.name, intern=intern):
+                        expected = FLPP(nodes=parser.nodes).decode(text)
+                        self.assertEqual(parser.decode(text), expected)
+                        self.assertEqual(parser.decode(text, lazy=True), expected)
+
+    def test_keys(self):
+        data = FLPP(intern="keys").decode(self.text)
+        a, b = data[1]["Inputs"], data[3]["Inputs"]
+        self.assertEqual(a, b)
+        self.assertIs(list(a)[0], list(b)[0])
+        # constructor names are values in the default representation
+        self.assertIs(a["Blend"], b["Blend"])
+        self.assertIsNot(a[1]["Value"], b[1]["Value"])
+        self.assertIsNot(data["Gamut.SLogVersion"], data["Gamut.SLogVersion2"])
+
+    def test_values(self):
+        data = FLPP(nodes=True, intern="values").decode(self.text)
+        a, b = data["A"].fields["Inputs"], data["B"].fields["Inputs"]
+        self.assertIs(a["Blend"].fields["Value"], b["Blend"].fields["Value"])
+        self.assertIs(a["Size"].fields["Value"], b["Size"].fields["Value"])
+        self.assertIs(data["Gamut.SLogVersion"], data["Gamut.SLogVersion2"])
+        data = FLPP(intern="values").decode("{ 1, 1.0, -0.0, 0.0, true }")
+        self.assertEqual([type(x) for x in data], [int, float, float, float, bool])
+        self.assertEqual(str(data[2]), "-0.0")
+
+    def test_options(self):
+        self.assertRaises(ValueError, FLPP, intern="all")
+        self.assertRaises(ValueError, FLPP, engine="char", intern="keys")
+        parser = FLPP(intern="keys")
+        self.assertIn("Inputs", parser.intern_table)
+        parser.register_named_tables(["InternFuse"])
+        self.assertIn("InternFuse", parser.intern_table)
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.folder = Path(tempfile.mkdtemp())
+        self.registry = self.folder / "registry.json"
+        self.registry.write_text('["MyFuse"]', encoding="utf-8")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_lazy_load(self):
+        parser = FLPP(registry=self.registry)
+        self.assertIsNone(parser._named_tables)
+        self.assertEqual(parser.encode(["MyFuse", {}]), "{\n\tMyFuse\n\t{}\n}")
+        self.assertEqual(parser.named_tables, {"MyFuse", "ordered()"})
+
+    def test_environment_variable(self):
+        os.environ["FLPP_REGISTRY"] = str(self.registry)
+        try:
+            self.assertIn("MyFuse", FLPP().named_tables)
+            self.assertIn("MyFuse", FLPP(registry=self.registry).named_tables)
+        finally:
+            del os.environ["FLPP_REGISTRY"]
+        self.assertNotIn("MyFuse", FLPP().named_tables)
+        self.assertIn("Loader", FLPP().named_tables)
+
+    def test_register(self):
+        parser = FLPP(registry=self.registry)
+        parser.register_named_tables(["PluginFuse"])
+        self.assertEqual(parser.named_tables, {"MyFuse", "PluginFuse", "ordered()"})
+        parser.register_named_tables(("OtherFuse",))
+        self.assertEqual(
+            parser.encode({"a": "OtherFuse", 1: {}, "b": "PluginFuse", 3: {}}),
+            "{\n\ta = OtherFuse\n\t{},\n\tb = PluginFuse\n\t{}\n}",
+        )
+        # the module function registers into the shared parser
+        self.assertNotIn("TestRegisteredFuse", flpp.named_tables)
+        register_named_tables(["TestRegisteredFuse"])
+        self.assertIn("TestRegisteredFuse", flpp.named_tables)
+
+    def test_cache(self):
+        # other pickles next to the registry are neither read nor removed
+        other = self.folder / "registry.backup.pickle"
+        other.write_bytes(b"not a pickle")
+        FLPP(registry=self.registry).named_tables
+        pattern = "registry.*.flpp-registry.pickle"
+        caches = list(self.folder.glob(pattern))
+        self.assertEqual(len(caches), 1)
+        self.assertIn("MyFuse", FLPP(registry=self.registry).named_tables)
+
+        # a rebuilt registry replaces the cache
+        self.registry.write_text('["OtherFuse"]', encoding="utf-8")
+        self.assertEqual(
+            FLPP(registry=self.registry).named_tables, {"OtherFuse", "ordered()"}
+        )
+        self.assertNotIn(caches[0], list(self.folder.glob(pattern)))
+        self.assertTrue(other.exists())
+
+    def test_import_time(self):
+        # import from another directory and check the registry is not loaded yet
+        src = Path(__file__).parent.parent.resolve()
+        code = (
+            "import time; start = time.perf_counter(); "
+            "from main.flpp import flpp; "
+            "print(time.perf_counter() - start, flpp._named_tables is None, "
+            "len(flpp.named_tables))"
+        )
+        env = dict(os.environ, PYTHONPATH=str(src))
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=self.folder,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        import_time, lazy, size = float(output[0]), output[1], int(output[2])
+        self.assertEqual(lazy, "True")
+        self.assertGreater(size, 1)
+        self.assertLess(import_time, 2)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,136 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+from contextlib import redirect_stderr, redirect_stdout
+
+try:
+    from src.main import index as index_module
+    from src.main.cli import main
+    from src.main.index import LibraryIndex, extract, parser
+except ModuleNotFoundError:
+    # running tests locally
+    from main import index as index_module
+    from main.cli import main
+    from main.index import LibraryIndex, extract, parser
+
+EXAMPLES = Path(__file__).parent / "examples"
+MACRO = """{
+    Tools = ordered() {
+        Shot = MacroOperator {
+            Tools = ordered() {
+                Glow = Fuse.SoftGlow { Inputs = {}, },
+                Out = Saver {
+                    Inputs = {
+                        Clip = Input { Value = Clip { Filename = "/renders/shot.0000.exr", }, },
+                    },
+                },
+            },
+        },
+    },
+}
+"""
+
+
+class TestExtract(unittest.TestCase):
+    def test_comp(self):
+        text = (EXAMPLES / "fusion_composition.comp").read_text(encoding="utf-8")
+        tools, media = extract(parser.decode(text, select=["Tools"]))
+        self.assertIn(("exr", "Loader", None), tools)
+        self.assertIn(
+            (
+                "exr",
+                "/Volumes/Apacer PHD/04_R_Road_Refueler_Night_BGs.0001.exr",
+                "read",
+            ),
+            media,
+        )
+
+    def test_macro(self):
+        tools, media = extract(parser.decode(MACRO))
+        self.assertEqual(
+            sorted(tools),
+            [
+                ("Glow", "Fuse.SoftGlow", "Shot"),
+                ("Out", "Saver", "Shot"),
+                ("Shot", "MacroOperator", None),
+            ],
+        )
+        self.assertEqual(media, [("Out", "/renders/shot.0000.exr", "write")])
+
+
+class TestLibraryIndex(unittest.TestCase):
+    def setUp(self):
+        self.folder = Path(tempfile.mkdtemp())
+        self.library = self.folder / "library"
+        self.library.mkdir()
+        shutil.copy(EXAMPLES / "fusion_composition.comp", self.library / "a.comp")
+        (self.library / "shot.setting").write_text(MACRO, encoding="utf-8")
+        self.db = str(self.folder / "index.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_update_and_query(self):
+        with LibraryIndex(self.db) as index:
+            counts = index.update([self.library])
+            self.assertEqual(counts["indexed"], 2)
+            comp = str((self.library / "a.comp").resolve())
+            setting = str((self.library / "shot.setting").resolve())
+            self.assertEqual(
+                index.reading("*/04_R_Road_Refueler_Night_BGs.*.exr"), [comp]
+            )
+            self.assertEqual(index.writing("/renders/*"), [setting])
+            self.assertEqual(index.using("Fuse.*Glow*"), [setting])
+            self.assertEqual(index.using("Loader"), [comp])
+            self.assertIn(("Shot", "MacroOperator", None), index.tools(setting))
+
+            self.assertEqual(index.update([self.library])["unchanged"], 2)
+            # touched files are compared by hash, changed ones indexed again
+            os.utime(self.library / "a.comp")
+            (self.library / "shot.setting").write_text(
+                MACRO.replace("SoftGlow", "Glow2"), encoding="utf-8"
+            )
+            counts = index.update([self.library])
+            self.assertEqual((counts["unchanged"], counts["indexed"]), (1, 1))
+            self.assertEqual(index.using("Fuse.*Glow*"), [setting])
+            self.assertEqual(index.using("Fuse.SoftGlow"), [])
+
+            (self.library / "shot.setting").unlink()
+            self.assertEqual(index.update([self.library])["removed"], 1)
+            self.assertEqual(index.files(), [comp])
+
+    def test_errors(self):
+        (self.library / "broken.comp").write_text("{ Tools = {", encoding="utf-8")
+        with LibraryIndex(self.db) as index:
+            counts = index.update([self.library], jobs=2)
+            self.assertEqual((counts["indexed"], counts["failed"]), (2, 1))
+            self.assertEqual(len(index.errors()), 1)
+
+    def test_removed_during_update(self):
+        files = index_module.collect([self.library])
+        gone = str(self.library / "gone.comp")
+        with LibraryIndex(self.db) as index:
+            # a file deleted between listing and indexing fails alone
+            with mock.patch.object(index_module, "collect", lambda _: files + [gone]):
+                counts = index.update([self.library])
+            self.assertEqual((counts["indexed"], counts["failed"]), (2, 1))
+            self.assertIn("FileNotFoundError", index.errors()[gone])
+            self.assertEqual(index.update([self.library])["removed"], 1)
+
+    def test_cli(self):
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            code = main(["index", "update", str(self.library), "--db", self.db])
+            self.assertEqual(code, 0)
+            main(["index", "query", "uses", "MacroOperator", "--db", self.db])
+        lines = out.getvalue().splitlines()
+        self.assertIn("2 indexed, 0 unchanged, 0 failed, 0 removed", lines[0])
+        self.assertEqual(lines[1:], [str((self.library / "shot.setting").resolve())])
+
+
+if __name__ == "__main__":
+    unittest.main()
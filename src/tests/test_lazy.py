@@ -0,0 +1,60 @@
+import unittest
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp, FLPP, NamedTable, ParseError
+    from src.main.lazy import LazyList, LazyTable, TableSpan, resolve
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp, FLPP, NamedTable, ParseError
+    from main.lazy import LazyList, LazyTable, TableSpan, resolve
+
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+class TestLazy(unittest.TestCase):
+    def test_examples(self):
+        parsers = [FLPP(), FLPP(nodes=True), FLPP(arrays="array")]
+        for file in EXAMPLES.glob("fusion_*.*"):
+            text = file.read_text(encoding="utf-8")
+            for parser in parsers:
+                data = parser.decode(text)
+                with self.subTest(file=file.name, nodes=parser.nodes):
+                    self.assertEqual(parser.decode(text, lazy=True), data)
+                    self.assertEqual(data, parser.decode(text.encode(), lazy=True))
+                    self.assertEqual(resolve(parser.decode(text, lazy=True)), data)
+
+    def test_on_demand(self):
+        text = "{ a = { 1, 2 }, b = Loader { x = { y = 1 } }, { 3 }, c = 'x', }"
+        parser = FLPP(nodes=True)
+        data = parser.decode(text, lazy=True)
+        self.assertIsInstance(data, LazyTable)
+        self.assertEqual(list(data), ["a", "b", 2, "c"])
+        self.assertIsInstance(data._items["b"], TableSpan)
+        loader = data["b"]
+        self.assertIs(data["b"], loader)
+        self.assertEqual(loader.type, "Loader")
+        self.assertIsInstance(loader.fields["x"], LazyTable)
+        self.assertIsInstance(data._items["a"], TableSpan)
+        self.assertIsInstance(data["a"], LazyList)
+        self.assertEqual(data["a"][::-1], [2, 1])
+        self.assertEqual(
+            resolve(data),
+            {"a": [1, 2], "b": NamedTable("Loader", {"x": {"y": 1}}), 2: [3], "c": "x"},
+        )
+
+    def test_values(self):
+        self.assertEqual(flpp.decode("42", lazy=True), 42)
+        self.assertEqual(flpp.decode("{}", lazy=True), {})
+        self.assertEqual(flpp.decode("{nil}", lazy=True), [])
+        self.assertEqual(resolve(flpp.decode("{ a = {,} }", lazy=True)), {"a": []})
+        self.assertEqual(flpp.decode("Composition { a = {} }", lazy=True), {"a": {}})
+        self.assertNotEqual(flpp.decode("{ { 1 } }", lazy=True), [[2]])
+        with self.assertRaises(ValueError):
+            flpp.decode("{}", select=["a"], lazy=True)
+        with self.assertRaises(ParseError):
+            flpp.decode("{ a = { 1 }", lazy=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import unittest
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp
+    from src.main.stats import ProfiledFLPP, Stats
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp
+    from main.stats import ProfiledFLPP, Stats
+
+EXAMPLES = Path(__file__).parent / "examples"
+COMP = (EXAMPLES / "fusion_composition.comp").read_text(encoding="utf-8")
+
+
+class TestProfile(unittest.TestCase):
+    def test_same_results(self):
+        parser = ProfiledFLPP()
+        self.assertEqual(parser.decode(COMP), flpp.decode(COMP))
+        self.assertEqual(parser.decode(COMP.encode()), flpp.decode(COMP))
+        data = flpp.decode(COMP)
+        self.assertEqual(parser.encode(data), flpp.encode(data))
+        self.assertEqual(
+            list(parser.iterparse(COMP, spans=True)),
+            list(flpp.iterparse(COMP, spans=True)),
+        )
+        self.assertEqual(list(parser.iterparse(COMP)), list(flpp.iterparse(COMP)))
+
+    def test_counts(self):
+        parser = ProfiledFLPP()
+        parser.decode('{ -- note\n a = { 1, "x", true }, b = 2.5 }')
+        stats = parser.stats
+        self.assertEqual(stats.calls["decode"], 1)
+        self.assertEqual(
+            dict(stats.tokens),
+            {"tables": 2, "numbers": 2, "strings": 1, "words": 3, "comments": 1},
+        )
+        self.assertEqual(stats.max_depth, 2)
+        self.assertEqual(
+            [entry["path"] for entry in stats.to_dict()["largest"]], ["", "a"]
+        )
+        self.assertGreater(stats.rate("decode"), 0)
+
+    def test_hooks(self):
+        phases, tables = [], []
+        parser = ProfiledFLPP(
+            on_phase=lambda *args: phases.append(args[0]),
+            on_table=lambda *args: tables.append(args),
+            largest=1,
+        )
+        data = parser.decode("{ a = { b = {} } }")
+        parser.dump(data, io.StringIO())
+        self.assertEqual(phases, ["decode", "encode"])
+        self.assertEqual(tables, [("a.b", 2), ("a", 10), ("", 18)])
+        self.assertEqual(parser.stats.to_dict()["largest"], [{"path": "", "size": 18}])
+        self.assertIn("keys", parser.stats.encoder)
+
+    def test_lazy_and_stream(self):
+        parser = ProfiledFLPP()
+        data = parser.decode(COMP, lazy=True)
+        self.assertEqual(dict(data), dict(flpp.decode(COMP, lazy=True)))
+        self.assertEqual(
+            list(parser.iterparse(COMP, lazy=True, offset=COMP.index("{"))),
+            list(flpp.iterparse(COMP, lazy=True, offset=COMP.index("{"))),
+        )
+        self.assertEqual(parser.decode_stream(io.StringIO(COMP)), flpp.decode(COMP))
+        self.assertEqual(parser.stats.calls["decode"], 2)
+        # streamed files count up to the end of their root table
+        size = len(COMP) + COMP.rindex("}") + 1
+        self.assertEqual(parser.stats.sizes["decode"], size)
+
+    def test_update(self):
+        first, second = ProfiledFLPP(), ProfiledFLPP()
+        first.decode("{ a = 1 }")
+        second.decode("{ b = { 2 } }")
+        stats = Stats()
+        stats.update(first.stats.to_dict())
+        stats.update(second.stats.to_dict())
+        self.assertEqual(stats.calls["decode"], 2)
+        self.assertEqual(stats.tokens["numbers"], 2)
+        self.assertEqual(stats.max_depth, 2)
+        self.assertEqual(len(stats.largest), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
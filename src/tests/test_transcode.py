@@ -0,0 +1,89 @@
+import io
+import json
+import unittest
+from pathlib import Path
+
+try:
+    from src.main.flpp import flpp, FLPP, FILE_HEADERS
+except ModuleNotFoundError:
+    # running tests locally
+    from main.flpp import flpp, FLPP, FILE_HEADERS
+
+EXAMPLES = Path(__file__).parent / "examples"
+CASES = {
+    "clip": '{ Clips = { Clip { ID = "Clip1" }, }, Empty = {}, { {}, { 1 } } }',
+    "dropped": '{ { 1 }, "Clip", c = { d = 2 } }',
+    "repeated": "{ a = 1, a = 2, { 1, 2 }, [true] = 3 }",
+    "floats": "{ 1e400, -0.5, 1001, [1001] = { 0.1 } }",
+    "nil": "{ {nil}, {,}, a = { nil }, b = { Clip nil }, c = {} }",
+    "value": '"text"',
+    "empty": "",
+}
+
+
+def lua_to_json(src, **options) -> str:
+    out = io.StringIO()
+    flpp.lua_to_json(src, out, **options)
+    return out.getvalue()
+
+
+def json_to_lua(text: str, **options) -> str:
+    out = io.StringIO()
+    flpp.json_to_lua(io.StringIO(text), out, **options)
+    return out.getvalue()
+
+
+class TestLuaToJson(unittest.TestCase):
+    def test_examples(self):
+        for file in EXAMPLES.glob("fusion_*.*"):
+            text = file.read_text(encoding="utf-8")
+            expected = json.dumps(flpp.decode(text), indent=4)
+            with self.subTest(file=file.name):
+                self.assertEqual(lua_to_json(text), expected)
+                self.assertEqual(lua_to_json(io.StringIO(text), chunk_size=7), expected)
+                with open(file, "rb") as f:
+                    self.assertEqual(lua_to_json(f), expected)
+                src = io.BytesIO(text.encode("utf-8"))
+                self.assertEqual(lua_to_json(src, chunk_size=7), expected)
+                self.assertFalse(src.closed)
+
+    def test_bytes_stream(self):
+        for text in ["{ a = 1 }", "\ufeff{ é = { 1, 2 } }"]:
+            with self.subTest(text=text):
+                src = io.BytesIO(text.encode("utf-8"))
+                expected = json.dumps(flpp.decode(text), indent=4)
+                self.assertEqual(lua_to_json(src), expected)
+
+    def test_cases(self):
+        for name, text in CASES.items():
+            with self.subTest(case=name):
+                data = flpp.decode(text)
+                self.assertEqual(lua_to_json(text), json.dumps(data, indent=4))
+                self.assertEqual(lua_to_json(text, indent=None), json.dumps(data))
+
+    def test_default_representation_only(self):
+        with self.assertRaises(ValueError):
+            FLPP(nodes=True).lua_to_json("{}", io.StringIO())
+
+
+class TestJsonToLua(unittest.TestCase):
+    def test_examples(self):
+        for file in EXAMPLES.glob("fusion_*.*"):
+            text = json.dumps(flpp.decode(file.read_text(encoding="utf-8")), indent=4)
+            header = FILE_HEADERS.get(file.suffix)
+            expected = flpp.encode(json.loads(text), header)
+            with self.subTest(file=file.name):
+                self.assertEqual(json_to_lua(text, header=header), expected)
+                self.assertEqual(
+                    json_to_lua(text, header=header, chunk_size=3), expected
+                )
+
+    def test_cases(self):
+        for name, text in CASES.items():
+            data = json.loads(json.dumps(flpp.decode(text)))
+            with self.subTest(case=name):
+                self.assertEqual(json_to_lua(json.dumps(data)), flpp.encode(data))
+
+
+if __name__ == "__main__":
+    unittest.main()